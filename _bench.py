@@ -0,0 +1,504 @@
+import json
+import os
+import random
+import sys
+import timeit
+import tracemalloc
+from itertools import islice
+from tempfile import NamedTemporaryFile
+import input_helper as ih
+
+
+# Call via the following:
+#   python3 _bench.py                 (run all benchmarks)
+#   python3 _bench.py from_string     (run benchmarks with matching names)
+
+
+def _report(label, seconds, count):
+    print('    {:<50} {:>10.3f} usec/item'.format(label, seconds / count * 1e6))
+
+
+def _time(func, repeat=5):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def _report_peak_memory(label, func):
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print('    {:<50} {:>10.1f} MB peak'.format(label, peak / 1e6))
+
+
+def bench_compressed():
+    records = _make_records(50000)
+    count = len(records)
+    path = _write_jsonl(records)
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    paths = [('uncompressed', path)]
+    for ext, opener in sorted(ih.COMPRESSED_OPENERS.items()):
+        compressed_path = path + ext
+        with opener(compressed_path, 'wb') as fp:
+            fp.write(data)
+        paths.append((ext, compressed_path))
+    try:
+        for label, _path in paths:
+            _report('stream=True ({}, {:.1f} MB)'.format(
+                label, os.path.getsize(_path) / 1e6
+            ), _time(lambda: sum(1 for _ in ih.yield_objs_from_json(_path, stream=True)), repeat=3), count)
+        for label, _path in paths:
+            _report('source=path ({})'.format(label), _time(
+                lambda: sum(1 for _ in ih.yield_objs_from_json(source=_path)), repeat=3
+            ), count)
+        _report_peak_memory('stream=True (.gz)', lambda: sum(
+            1 for _ in ih.yield_objs_from_json(path + '.gz', stream=True)
+        ))
+    finally:
+        for _, _path in paths:
+            os.remove(_path)
+
+
+def _make_deep_record(i):
+    return {
+        'a{}'.format(j): {
+            'b{}'.format(k): {
+                'c{}'.format(m): {'d': i + m, 'e': [{'f': m}, {'f': k}]}
+                for m in range(4)
+            }
+            for k in range(5)
+        }
+        for j in range(4)
+    }
+
+
+def bench_filter_keys():
+    records = [_make_deep_record(i) for i in range(2000)]
+    count = len(records)
+    deep_keys = [
+        'a{}.b{}.c{}.{}'.format(i % 4, i // 4 % 5, i // 20 % 4, 'd' if i % 2 else 'e.f')
+        for i in range(80)
+    ]
+    few_keys = deep_keys[:5]
+
+    def uncompiled(d, keys):
+        return {key.replace('.', '__'): ih.get_value_at_key(d, key) for key in keys}
+
+    for label, keys in (('80 deep keys', deep_keys), ('5 keys', few_keys)):
+        _report('get_value_at_key per key ({})'.format(label), _time(lambda: [
+            uncompiled(d, keys) for d in records
+        ]), count)
+        _report('filter_keys(*keys) ({})'.format(label), _time(lambda: [
+            ih.filter_keys(d, *keys) for d in records
+        ]), count)
+        keys_string = ', '.join(keys)
+        _report('filter_keys(keys_string) ({})'.format(label), _time(lambda: [
+            ih.filter_keys(d, keys_string) for d in records
+        ]), count)
+
+
+def bench_from_string():
+    values = [
+        'true', 'False', 'none', '10', '0.50', '007', '12345', '3.14159',
+        'localhost', '6379', 'some-service-name', '-42', '1e3', 'info',
+    ] * 5000
+    count = len(values)
+    uncached = ih._from_string.__wrapped__
+    ih._from_string.cache_clear()
+    _report('uncached per-call conversion', _time(lambda: [uncached(v) for v in values]), count)
+    _report('from_string', _time(lambda: [ih.from_string(v) for v in values]), count)
+    _report('from_strings', _time(lambda: ih.from_strings(values)), count)
+
+    digits = [str(i) for i in range(count)]
+    ih._from_string.cache_clear()
+    _report('uncached per-call conversion (unique digits)', _time(lambda: [uncached(v) for v in digits]), count)
+    _report('from_string (unique digits)', _time(lambda: [ih.from_string(v) for v in digits]), count)
+    _report('from_strings (unique digits)', _time(lambda: ih.from_strings(digits)), count)
+
+    floats = ['{:.3f}'.format(i / 7) for i in range(count)]
+    _report('uncached per-call conversion (unique floats)', _time(lambda: [uncached(v) for v in floats]), count)
+    _report('from_string (unique floats)', _time(lambda: [ih.from_string(v) for v in floats]), count)
+    _report('from_strings (unique floats)', _time(lambda: ih.from_strings(floats)), count)
+
+    # Config/Redis-like values: half repeated words, then unique ints and floats
+    rand = random.Random(0)
+    words = ['true', 'false', 'none', 'localhost', 'info', 'debug', 'utf-8', 'us-east-1']
+    mixed = []
+    for i in range(count):
+        kind = rand.random()
+        if kind < 0.5:
+            mixed.append(rand.choice(words))
+        elif kind < 0.8:
+            mixed.append(str(rand.randrange(100000000)))
+        else:
+            mixed.append('{:.2f}'.format(rand.uniform(0, 100000)))
+    ih._from_string.cache_clear()
+    _report('uncached per-call conversion (realistic mix)', _time(lambda: [uncached(v) for v in mixed]), count)
+    _report('from_string (realistic mix)', _time(lambda: [ih.from_string(v) for v in mixed]), count)
+    _report('from_strings (realistic mix)', _time(lambda: ih.from_strings(mixed)), count)
+
+
+def bench_infer_and_convert():
+    count = 20000
+    columns = {
+        'id': [str(i) for i in range(count)],
+        'price': ['{}.{}'.format(i % 500, i % 100) for i in range(count)],
+        'active': ['true' if i % 3 else 'false' for i in range(count)],
+        'zipcode': ['{:05}'.format(i % 99999) for i in range(count)],
+        'name': ['name-{}'.format(i) for i in range(count)],
+    }
+    cells = count * len(columns)
+    uncached = ih._from_string.__wrapped__
+    _report('uncached from_string per cell', _time(lambda: {
+        k: [uncached(v) for v in vals] for k, vals in columns.items()
+    }), cells)
+    _report('from_string per cell', _time(lambda: {
+        k: [ih.from_string(v) for v in vals] for k, vals in columns.items()
+    }), cells)
+    _report('infer_and_convert', _time(lambda: ih.infer_and_convert(columns)), cells)
+
+
+def _make_records(count):
+    return [
+        {
+            'id': i,
+            'status': 'running' if i % 3 else 'stopped',
+            'name': 'record-{}'.format(i),
+            'thing': {'a': i % 17, 'b': str(i % 5), 'c': list(range(5))},
+            'extra': {'x': {'y': 'z' * 20}, 'tags': ['a', 'b', 'c']},
+        }
+        for i in range(count)
+    ]
+
+
+def _write_jsonl(records):
+    with NamedTemporaryFile('w', suffix='.jsonl', delete=False) as fp:
+        for record in records:
+            fp.write(json.dumps(record) + '\n')
+    return fp.name
+
+
+def bench_json_stream():
+    records = _make_records(50000)
+    count = len(records)
+    path = _write_jsonl(records)
+    try:
+        _report('yield_objs_from_json (read whole file)', _time(
+            lambda: sum(1 for _ in ih.yield_objs_from_json(path)), repeat=3
+        ), count)
+        _report('yield_objs_from_json (stream=True)', _time(
+            lambda: sum(1 for _ in ih.yield_objs_from_json(path, stream=True)), repeat=3
+        ), count)
+        _report_peak_memory('yield_objs_from_json (read whole file)', lambda: sum(
+            1 for _ in ih.yield_objs_from_json(path)
+        ))
+        _report_peak_memory('yield_objs_from_json (stream=True)', lambda: sum(
+            1 for _ in ih.yield_objs_from_json(path, stream=True)
+        ))
+    finally:
+        os.remove(path)
+
+
+def _make_wide_records(count, width=50):
+    records = _make_records(count)
+    for record in records:
+        for i in range(width):
+            record['field{}'.format(i)] = {'x': 'y' * 20, 'z': [1, 2, {'k': i}], 'w': i}
+    return records
+
+
+def bench_json_offset_index():
+    records = _make_records(100000)
+    count = len(records)
+    path = _write_jsonl(records)
+    positions = random.Random(0).sample(range(count), 100)
+    try:
+        _report('build JsonOffsetIndex', _time(lambda: (
+            os.remove(path + '.idx') if os.path.exists(path + '.idx') else None,
+            ih.JsonOffsetIndex(path),
+        ), repeat=3), count)
+        _report('load JsonOffsetIndex from sidecar file', _time(lambda: ih.JsonOffsetIndex(path)), count)
+        index = ih.JsonOffsetIndex(path)
+        _report('yield_objs_from_json (stream) to each Nth object', _time(lambda: [
+            next(islice(ih.yield_objs_from_json(path, stream=True), i, None)) for i in positions[:5]
+        ], repeat=1), 5)
+        _report('JsonOffsetIndex[N]', _time(lambda: [index[i] for i in positions]), len(positions))
+        _report('JsonOffsetIndex[N:N + 1000] (per object)', _time(
+            lambda: index[50000:51000]
+        ), 1000)
+        extra = ''.join([json.dumps(d) + '\n' for d in records[:100]])
+
+        def append_and_update():
+            with open(path, 'a') as fp:
+                fp.write(extra)
+            index.update()
+
+        _report('append 100 objects and update (per new object)', _time(append_and_update), 100)
+    finally:
+        os.remove(path)
+        os.remove(path + '.idx')
+
+
+def bench_json_projection():
+    records = _make_wide_records(5000)
+    count = len(records)
+    keys = 'id, name, thing.a, thing.b'
+    document = json.dumps(records)
+    jsonl = '\n'.join([json.dumps(d) for d in records])
+    _report_peak_memory('filter_keys after get_obj_from_json (array)', lambda: [
+        ih.filter_keys(d, keys) for d in ih.get_obj_from_json(document)
+    ])
+    _report_peak_memory('get_obj_from_json(keys=...) (array)', lambda: ih.get_obj_from_json(
+        document, keys=keys
+    ))
+    _report('filter_keys after get_obj_from_json (array)', _time(lambda: [
+        ih.filter_keys(d, keys) for d in ih.get_obj_from_json(document)
+    ], repeat=3), count)
+    _report('get_obj_from_json(keys=...) (array)', _time(
+        lambda: ih.get_obj_from_json(document, keys=keys), repeat=3
+    ), count)
+    _report('filter_keys after yield_objs_from_json (JSONL)', _time(lambda: [
+        ih.filter_keys(d, keys) for d in ih.yield_objs_from_json(jsonl)
+    ], repeat=3), count)
+    _report('yield_objs_from_json(keys=...) (JSONL)', _time(
+        lambda: list(ih.yield_objs_from_json(jsonl, keys=keys)), repeat=3
+    ), count)
+
+    object_keys = 'id, field0'
+    _report_peak_memory('get_obj_from_json(keys=...) ending at an object (array)', lambda: ih.get_obj_from_json(
+        document, keys=object_keys
+    ))
+    _report('filter_keys after get_obj_from_json, ending at an object (array)', _time(lambda: [
+        ih.filter_keys(d, object_keys) for d in ih.get_obj_from_json(document)
+    ], repeat=3), count)
+    _report('get_obj_from_json(keys=...) ending at an object (array)', _time(
+        lambda: ih.get_obj_from_json(document, keys=object_keys), repeat=3
+    ), count)
+
+
+def bench_json_skip_errors():
+    records = _make_records(50000)
+    count = len(records)
+    lines = [json.dumps(d) for d in records]
+    clean_text = '\n'.join(lines)
+    lines[count // 2] = lines[count // 2][:-5]
+    text = '\n'.join(lines)
+
+    def until_error():
+        try:
+            for _ in ih.yield_objs_from_json(text):
+                pass
+        except ValueError:
+            pass
+
+    _report('yield_objs_from_json (one bad line, raises)', _time(until_error, repeat=1), count)
+    _report('yield_objs_from_json(skip_errors=True)', _time(
+        lambda: sum(1 for _ in ih.yield_objs_from_json(text, skip_errors=True)), repeat=3
+    ), count)
+    for i in range(0, count, 50):
+        lines[i] = lines[i][:-5]
+    many_bad_text = '\n'.join(lines)
+    _report('yield_objs_from_json(skip_errors=True) (1000 bad)', _time(
+        lambda: sum(1 for _ in ih.yield_objs_from_json(many_bad_text, skip_errors=True)), repeat=3
+    ), count)
+    _report('yield_objs_from_json (no bad line)', _time(
+        lambda: sum(1 for _ in ih.yield_objs_from_json(clean_text)), repeat=3
+    ), count)
+
+
+def bench_json_source():
+    records = _make_records(50000)
+    count = len(records)
+    payload = '\n'.join([json.dumps(d) for d in records]).encode('utf-8')
+    _report('yield_objs_from_json(bytes)', _time(
+        lambda: sum(1 for _ in ih.yield_objs_from_json(payload)), repeat=3
+    ), count)
+    _report('yield_objs_from_json(source=bytes)', _time(
+        lambda: sum(1 for _ in ih.yield_objs_from_json(source=payload)), repeat=3
+    ), count)
+    _report_peak_memory('yield_objs_from_json(bytes)', lambda: sum(
+        1 for _ in ih.yield_objs_from_json(payload)
+    ))
+    _report_peak_memory('yield_objs_from_json(source=bytes)', lambda: sum(
+        1 for _ in ih.yield_objs_from_json(source=payload)
+    ))
+
+
+def bench_json_backends():
+    records = _make_records(20000)
+    count = len(records)
+    payloads = [
+        ('one large object', json.dumps({'records': records}), count),
+        ('JSONL', '\n'.join([json.dumps(d) for d in records]), count),
+        ('stacked pretty-printed', '\n'.join([json.dumps(d, indent=2) for d in records]), count),
+        ('small object', json.dumps(records[0]), 1),
+    ]
+    for label, text, item_count in payloads:
+        for backend in sorted(ih.JSON_BACKENDS):
+            if item_count == 1:
+                _report('{} ({})'.format(label, backend), _time(lambda: [
+                    ih.get_obj_from_json(text, backend=backend) for _ in range(10000)
+                ]), 10000)
+            else:
+                _report('{} ({})'.format(label, backend), _time(
+                    lambda: list(ih.yield_objs_from_json(text, backend=backend)), repeat=3
+                ), item_count)
+
+
+def bench_jsonl_parallel():
+    records = _make_records(200000)
+    count = len(records)
+    path = _write_jsonl(records)
+    try:
+        _report('yield_objs_from_json (stream=True)', _time(
+            lambda: sum(1 for _ in ih.yield_objs_from_json(path, stream=True)), repeat=3
+        ), count)
+        _report('yield_objs_from_jsonl_parallel', _time(
+            lambda: sum(1 for _ in ih.yield_objs_from_jsonl_parallel(path)), repeat=3
+        ), count)
+        _report('yield_objs_from_jsonl_parallel (ordered=False)', _time(
+            lambda: sum(1 for _ in ih.yield_objs_from_jsonl_parallel(path, ordered=False)), repeat=3
+        ), count)
+        _report('find_items/filter_keys after streaming', _time(lambda: sum(
+            1 for d in ih.find_items(ih.yield_objs_from_json(path, stream=True), 'status:stopped')
+            if ih.filter_keys(d, 'id, thing.a')
+        ), repeat=3), count)
+        _report('yield_objs_from_jsonl_parallel (terms and keys)', _time(lambda: sum(
+            1 for _ in ih.yield_objs_from_jsonl_parallel(path, 'status:stopped', 'id, thing.a')
+        ), repeat=3), count)
+    finally:
+        os.remove(path)
+
+
+def bench_pipeline():
+    records = _make_records(20000)
+    count = len(records)
+
+    def chained():
+        return [
+            ih.cast_keys(
+                ih.rename_keys(ih.filter_keys(d, 'id, name, thing.a, thing.b'), thing__b='b'),
+                b=int
+            )
+            for d in ih.find_items(records, 'status:running')
+        ]
+
+    pipeline = ih.Pipeline().find('status:running').filter_keys(
+        'id, name, thing.a, thing.b'
+    ).rename_keys(thing__b='b').cast_keys(b=int)
+    _report('chained find_items/filter/rename/cast', _time(chained), count)
+    _report('Pipeline', _time(lambda: list(pipeline(records))), count)
+
+
+def bench_specialize():
+    records = _make_records(20000)
+    count = len(records)
+    keys = 'id, name, thing.a, thing.b, extra.x.y'
+    filter_func = ih.specialize(records[0], 'filter_keys', keys)
+    _report('filter_keys', _time(lambda: [ih.filter_keys(d, keys) for d in records]), count)
+    _report('specialized filter_keys', _time(lambda: [filter_func(d) for d in records]), count)
+
+    flatten_func = ih.specialize(records[0], 'flatten_and_ignore_keys', 'extra.tags', copy='none')
+    _report('flatten_and_ignore_keys', _time(lambda: [
+        ih.flatten_and_ignore_keys(d, 'extra.tags', copy='none') for d in records
+    ]), count)
+    _report('specialized flatten_and_ignore_keys', _time(lambda: [
+        flatten_func(d) for d in records
+    ]), count)
+
+    rename_func = ih.specialize(records[0], 'rename_keys', _copy='none', id='_id', thing='other')
+    _report('rename_keys', _time(lambda: [
+        ih.rename_keys(d, _copy='none', id='_id', thing='other') for d in records
+    ]), count)
+    _report('specialized rename_keys', _time(lambda: [rename_func(d) for d in records]), count)
+
+
+def bench_top_counted_items():
+    rand = random.Random(0)
+    items = ['tag{}'.format(int(rand.paretovariate(1.0))) for _ in range(300000)]
+    count = len(items)
+    _report('unique_counted_items()[:10]', _time(lambda: ih.unique_counted_items(items)[:10]), count)
+    _report('unique_counted_items(limit=10)', _time(lambda: ih.unique_counted_items(items, limit=10)), count)
+    many = ['id{}'.format(int(rand.paretovariate(0.3))) for _ in range(300000)]
+    _report('unique_counted_items()[:10] (many unique)', _time(lambda: ih.unique_counted_items(many)[:10]), count)
+    _report('unique_counted_items(limit=10) (many unique)', _time(
+        lambda: ih.unique_counted_items(many, limit=10)
+    ), count)
+    _report('top_counted_items(limit=10) (100 counters)', _time(lambda: ih.top_counted_items(items, 10)), count)
+    _report('top_counted_items(limit=10) (1000 counters)', _time(
+        lambda: ih.top_counted_items(items, 10, capacity=1000)
+    ), count)
+
+
+def bench_unflatten():
+    flat = {
+        'group{}.section{}.field{}'.format(i % 10, i % 37, i): i
+        for i in range(3000)
+    }
+    flat_dicts = [dict(flat) for _ in range(50)]
+    count = len(flat_dicts)
+    uncached = ih._get_unflatten_plan.__wrapped__
+    _report('split and walk every key per dict (3000 keys)', _time(lambda: [
+        ih._unflatten_with_plan(d, uncached(tuple(d), False)) for d in flat_dicts
+    ]), count)
+    _report('unflatten_many (3000 keys)', _time(lambda: list(ih.unflatten_many(flat_dicts))), count)
+
+
+def _make_xml(count):
+    return '<records>{}</records>'.format(''.join([
+        '<record id="{0}"><name>record-{0}</name><status>{1}</status>'
+        '<tags><tag>a</tag><tag>b</tag></tags></record>'.format(i, 'running' if i % 3 else 'stopped')
+        for i in range(count)
+    ])).encode('utf-8')
+
+
+def bench_xml_convert():
+    deep = '<root>{}</root>'.format(''.join([
+        '<a id="{0}"><b><c><d><e x="1">{0}</e><f>true</f></d></c></b></a>'.format(i) for i in range(2000)
+    ]))
+    docs = [
+        ('wide', ih.xml_fromstring(_make_xml(20000)), 20000),
+        ('deep', ih.xml_fromstring(deep), 2000),
+    ]
+    for label, root, count in docs:
+        for convention in ('BadgerFish', 'Parker'):
+            if ih.xmljson is not None:
+                converter = getattr(ih.xmljson, convention)()
+                _report('xmljson.{} ({})'.format(convention, label), _time(
+                    lambda: converter.data(root), repeat=3
+                ), count)
+            data_func = ih._get_xml_data_func(convention)
+            _report('built-in {} ({})'.format(convention, label), _time(
+                lambda: data_func(root), repeat=3
+            ), count)
+
+
+def bench_xml_stream():
+    payload = _make_xml(100000)
+    count = 100000
+    _report('_parse_xml_source (whole tree)', _time(
+        lambda: len(ih._parse_xml_source(payload)), repeat=3
+    ), count)
+    _report('_iter_xml_elements', _time(
+        lambda: sum(1 for _ in ih._iter_xml_elements(payload, 'records/record')), repeat=3
+    ), count)
+    _report_peak_memory('_parse_xml_source (whole tree)', lambda: len(ih._parse_xml_source(payload)))
+    _report_peak_memory('_iter_xml_elements', lambda: sum(
+        1 for _ in ih._iter_xml_elements(payload, 'records/record')
+    ))
+
+
+BENCHMARKS = [
+    (name[6:], func)
+    for name, func in sorted(globals().items())
+    if name.startswith('bench_')
+]
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:]
+    for name, func in BENCHMARKS:
+        if names and not any([n in name for n in names]):
+            continue
+        print('\n{}'.format(name))
+        func()
@@ -1,17 +1,34 @@
+import gzip
 import keyword
+import pickle
 import re
 import string
 import textwrap
+import zlib
+from array import array
 from ast import literal_eval
-from collections import defaultdict, Counter
-from copy import deepcopy
+from bisect import bisect_right
+from collections import defaultdict, deque, Counter, OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+)
+from codecs import getincrementaldecoder
+from contextlib import contextmanager
+from copy import copy as shallowcopy, deepcopy
 from datetime import timedelta
-from fnmatch import fnmatch
-from functools import partial
+from fnmatch import translate as fnmatch_translate
+from functools import lru_cache, partial
+from heapq import heapify, heappop, heappush, merge, nlargest, nsmallest
 from input_helper import matcher
+from itertools import islice
 from json import JSONDecoder, JSONDecodeError
-from os.path import isfile
+from operator import itemgetter, methodcaller
+from os import cpu_count, stat
+from os.path import getsize, isfile, normcase, splitext
 from sys import stdin
+from tempfile import TemporaryFile
+from xml.etree.ElementTree import XMLParser, XMLPullParser, fromstring as xml_fromstring
 try:
     ModuleNotFoundError
 except NameError:
@@ -19,10 +36,24 @@ except NameError:
         pass
 try:
     import xmljson
-    from xml.etree.ElementTree import fromstring as xml_fromstring
 except (ImportError, ModuleNotFoundError):
     xmljson = None
-    xml_fromstring = None
+try:
+    import bz2
+except (ImportError, ModuleNotFoundError):
+    bz2 = None
+try:
+    import lzma
+except (ImportError, ModuleNotFoundError):
+    lzma = None
+try:
+    import orjson
+except (ImportError, ModuleNotFoundError):
+    orjson = None
+try:
+    import ujson
+except (ImportError, ModuleNotFoundError):
+    ujson = None
 try:
     from click import getchar
 except (ImportError, ModuleNotFoundError):
@@ -60,6 +91,8 @@ RX_COLON = re.compile(r'^((?P<hours>\d+):)?(?P<minutes>\d+):(?P<seconds>\d+)$')
 RX_NOT_WHITESPACE = re.compile(r'[^\s]')
 RX_ENCLOSING_B_SINGLE_QUOTE = re.compile(r"^b'(.*)'$")
 RX_NEWLINE = re.compile(r'\r?\n')
+RX_NOT_JSON_NUMBER_CHAR = re.compile(r'[^\d.eE+\-]')
+RX_JSON_RECORD_START = re.compile(r'\n(?=[\[{])')
 RX_NEWLINE_LEADING_SPACE = re.compile(r'\r?\n\s*')
 sm = matcher.SpecialTextMultiMatcher()
 um = matcher.UrlMatcher()
@@ -87,6 +120,23 @@ CH2NAME.update({
 })
 NAME2CH = {v: k for k, v in CH2NAME.items()}
 TRANS_PUNC_TO_UNDERSCORE = str.maketrans(string.punctuation, '_' * len(string.punctuation))
+TRANS_DIGITS_TO_ZERO = bytes.maketrans(b'123456789', b'0' * 9)
+FROM_STRING_CACHE_SIZE = 4096
+NUMBER_START_CHARS = frozenset('0123456789-+.')
+KEY_PATH_CACHE_SIZE = 1024
+FILTER_KEYS_CACHE_SIZE = 128
+UNFLATTEN_PLAN_CACHE_SIZE = 128
+SPECIALIZE_CACHE_SIZE = 128
+XML_CONVERTER_CACHE_SIZE = 32
+JSON_BUFFER_SIZE = 2 ** 16
+JSONL_CHUNK_SIZE = 2 ** 22
+JSON_PRUNE_MIN_SIZE = 2 ** 16
+JSON_INDEX_MAGIC = int.from_bytes(b'JSONIDX2', 'little')
+JSON_INDEX_CRC_SIZE = 2 ** 16
+XML_BUFFER_SIZE = 2 ** 16
+MAX_PATH_LENGTH = 4096
+XML_CONVENTIONS = ('Abdera', 'BadgerFish', 'Cobra', 'GData', 'Parker', 'Yahoo')
+CONVERTIBLE_WORDS = {'true', 'false', 'none', 'nan', 'inf', 'infinity'}
 
 
 def _less_than(x, y):
@@ -270,11 +320,10 @@ def string_to_converted_list(s, keep_num_as_string=False):
     - keep_num_as_string: if True, do not attempt to convert number strings to
       int or float
     """
-    _from_string = partial(from_string, keep_num_as_string=keep_num_as_string)
     result = []
     if type(s) == str:
         s = s.replace('\\n', '\n').replace('\\t', '\t')
-        result = list(map(_from_string, string_to_list(s)))
+        result = from_strings(string_to_list(s), keep_num_as_string=keep_num_as_string)
     return result
 
 
@@ -297,17 +346,19 @@ def get_list_from_arg_strings(*args):
 
 
 def get_all_urls(*urls_or_filenames):
-    """Return a list of all urls from objects that are urls or files of urls"""
+    """Return a list of all urls from objects that are urls or files of urls
+
+    Files are read a line at a time, and gzip, bz2, or xz compressed files are
+    decompressed as they are read (see open_path)
+    """
     urls = []
     for thing in urls_or_filenames:
         if isfile(thing):
-            with open(thing, 'r') as fp:
-                text = fp.read()
-
-            for line in re.split('\r?\n', text):
-                matched = um(line)
-                if matched:
-                    urls.extend(matched['url_list'])
+            with open_path(thing, 'rt') as fp:
+                for line in fp:
+                    matched = um(line.rstrip('\n'))
+                    if matched:
+                        urls.extend(matched['url_list'])
         else:
             matched = um(thing)
             if matched:
@@ -315,6 +366,43 @@ def get_all_urls(*urls_or_filenames):
     return urls
 
 
+COMPRESSED_OPENERS = {'.gz': gzip.open}
+COMPRESSION_MAGIC = [(b'\x1f\x8b', gzip.open)]
+if bz2 is not None:
+    COMPRESSED_OPENERS['.bz2'] = bz2.open
+    COMPRESSION_MAGIC.append((b'BZh', bz2.open))
+if lzma is not None:
+    COMPRESSED_OPENERS['.xz'] = lzma.open
+    COMPRESSION_MAGIC.append((b'\xfd7zXZ\x00', lzma.open))
+
+
+def open_path(path, mode='rb'):
+    """Return an open file object for path, that decompresses a gzip, bz2, or
+    xz compressed file as it is read
+
+    - path: path to a file
+    - mode: 'rb' or 'rt' (text is decoded with the default encoding, like open)
+
+    Compression is detected by the magic bytes at the start of the file, so a
+    plain file is opened with open whatever its extension. The extension
+    (.gz, .bz2, .xz) is only used when the start of the file is empty or can't
+    be read
+    """
+    try:
+        with open(path, 'rb') as fp:
+            head = fp.read(6)
+    except OSError:
+        head = b''
+    for magic, opener in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return opener(path, mode)
+    if not head:
+        opener = COMPRESSED_OPENERS.get(splitext(path)[1].lower())
+        if opener is not None:
+            return opener(path, mode)
+    return open(path, mode)
+
+
 def _clean_obj_string_for_parsing(s):
     """Return a "cleaned" string to be used in get_obj_from_[xml|json] funcs
 
@@ -328,18 +416,204 @@ def _clean_obj_string_for_parsing(s):
     return s
 
 
-def yield_objs_from_json(json_text, pos=0, decoder=JSONDecoder(), cleaned=False):
+def _looks_like_path(s):
+    """Return True if the string s could be a file path (so isfile is worth calling)
+
+    Keeps isfile from encoding a large JSON/XML payload just to stat it
+    """
+    return type(s) == str and 0 < len(s) < MAX_PATH_LENGTH and '\n' not in s
+
+
+def _get_buffer_read_func(view):
+    """Return a func that returns the next (at most) size bytes of a memoryview
+    (or characters of a string)
+
+    - view: a 1-dimensional memoryview of bytes, or a string
+
+    The returned chunks of a memoryview are slices (not copies)
+    """
+    pos = 0
+
+    def read(size=-1):
+        nonlocal pos
+        if size is None or size < 0:
+            size = len(view) - pos
+        data = view[pos:pos + size]
+        pos += len(data)
+        return data
+
+    return read
+
+
+def _get_text_read_func(read, encoding='utf-8'):
+    """Return a func that returns (at most) size characters, decoded from a
+    func that returns bytes
+
+    - read: a func that accepts a number of bytes (like the read method of a
+      binary file)
+    - encoding: name of the encoding of the bytes
+
+    Multi-byte characters split between reads are handled by an incremental
+    decoder, and an empty string is only returned at the end
+    """
+    decoder = getincrementaldecoder(encoding)()
+
+    def read_text(size):
+        while True:
+            data = read(size)
+            text = decoder.decode(data, final=not data)
+            if text or not data:
+                return text
+
+    return read_text
+
+
+@contextmanager
+def _open_source(source, binary=False):
+    """Yield a read func for a file path, open file, or bytes-like buffer
+
+    - source: a file path, a file object opened in binary or text mode, or a
+      bytes, bytearray, memoryview, or mmap object
+    - binary: if True, the read func returns bytes-like chunks (and source
+      must not be a text file), otherwise it returns text decoded as utf-8
+
+    Nothing is read until the read func is called, buffers are read through
+    memoryview slices (not copied), and file paths are opened with open_path
+    (so compressed files are decompressed as they are read)
+    """
+    if type(source) == str or hasattr(source, '__fspath__'):
+        with open_path(source) as fp:
+            yield fp.read if binary else _get_text_read_func(fp.read)
+    elif hasattr(source, 'read'):
+        if type(source.read(0)) == str:
+            if binary:
+                raise ValueError('source must be opened in binary mode')
+            yield source.read
+        else:
+            yield source.read if binary else _get_text_read_func(source.read)
+    else:
+        view = memoryview(source)
+        try:
+            if view.ndim != 1 or view.format != 'B':
+                view = view.cast('B')
+            read = _get_buffer_read_func(view)
+            yield read if binary else _get_text_read_func(read)
+        finally:
+            # Let an mmap be closed once reading is done
+            view.release()
+
+
+def _has_long_digit_run(s, chunk_size=2 ** 20):
+    """Return True if s (str or bytes) has 19 or more digits in a row
+
+    orjson turns ints that don't fit in 64 bits into floats (and ujson can't
+    decode them), so text that may have one is left to the json module
+
+    Long text is checked chunk_size characters at a time (with some overlap),
+    so it is never copied as a whole
+    """
+    for start in range(0, len(s), chunk_size):
+        chunk = s[start:start + chunk_size + 18]
+        if type(chunk) == str:
+            chunk = chunk.encode('utf-8', 'surrogatepass')
+        if b'0' * 19 in chunk.translate(TRANS_DIGITS_TO_ZERO):
+            return True
+    return False
+
+
+JSON_DECODER = JSONDecoder()
+JSON_BACKENDS = {'json': None}
+if ujson is not None:
+    JSON_BACKENDS['ujson'] = ujson.loads
+if orjson is not None:
+    JSON_BACKENDS['orjson'] = orjson.loads
+JSON_BACKEND = 'orjson' if orjson is not None else 'ujson' if ujson is not None else 'json'
+
+
+def yield_objs_from_json(json_text=None, pos=0, decoder=JSON_DECODER, cleaned=False,
+                         stream=False, buffer_size=JSON_BUFFER_SIZE, backend=None,
+                         source=None, keys=None, ignore=None, skip_errors=False,
+                         skipped=None):
     """Yield converted JSON objects for stacked JSON objects in a string or file
 
+    - json_text: a string of JSON (or a file path, which may be gzip, bz2, or
+      xz compressed, see open_path)
     - cleaned: if True, don't clean json_text with _clean_obj_string_for_parsing
+    - stream: if True and json_text is a file path (or an open text file), read
+      and decode buffer_size characters at a time, yielding each object as
+      soon as it is complete, instead of reading the whole file first
+        - memory used only depends on the largest single object
+        - the literal_eval fallback is not tried when streaming
+    - buffer_size: number of characters to read at a time when streaming
+    - backend: name of the JSON library to decode with first (one of
+      JSON_BACKENDS, default is JSON_BACKEND unless a custom decoder is passed)
+        - the whole text (or each line) is decoded with the backend, and
+          anything it can't decode is left to decoder, with the same stacked
+          object and literal_eval fallback rules
+    - source: use instead of json_text for a file path, an open file (binary
+      or text), or a bytes, bytearray, memoryview, or mmap object
+        - always streamed (as if stream is True), and utf-8 bytes are decoded
+          buffer_size at a time, so the whole payload is never copied
+        - no cleaning is done, and pos is a number of characters to skip
+    - keys: if specified, yield a dict with only these keys for each record
+      (same as filter_keys), where a record is a top-level object or an object
+      in a top-level array
+        - text longer than JSON_PRUNE_MIN_SIZE (i.e. a large array) is decoded
+          with the keys that are not part of any of the key names dropped as
+          each object is done (see _ProjectingDecoder), so it is never fully
+          built in memory (unless a key name ends at an object in the first
+          record, which needs all of its keys)
+        - smaller text (i.e. each line of JSONL) is decoded with backend
+          first, then filtered
+    - ignore: if specified, yield each record without these keys (same as
+      ignore_keys, with no copy)
+    - skip_errors: if True, text that can't be decoded is skipped up to the
+      next line that starts with { or [ (instead of trying literal_eval on the
+      rest of the text and raising)
+        - the text is decoded buffer_size characters at a time (as if
+          streaming), and more text is only read to finish an object when
+          there is no such line after the error
+    - skipped: a list to append (offset, length) to for each part of the text
+      skipped by skip_errors (in characters)
 
     See: https://stackoverflow.com/a/50384432
     """
+    loads = _get_json_loads(backend, decoder)
+    if keys or ignore:
+        if decoder is not JSON_DECODER:
+            raise ValueError('keys and ignore can not be used with a custom decoder')
+        decoder = _ProjectingDecoder(keys, ignore)
+        if loads is not None:
+            loads = partial(_loads_and_project, loads, decoder)
+    if source is not None:
+        with _open_source(source) as read:
+            yield from _yield_objs_from_json_reader(
+                read, pos, decoder, buffer_size, loads, skip_errors, skipped
+            )
+        return
+    if stream and hasattr(json_text, 'read'):
+        yield from _yield_objs_from_json_reader(
+            json_text.read, pos, decoder, buffer_size, loads, skip_errors, skipped
+        )
+        return
     if not cleaned:
         json_text = _clean_obj_string_for_parsing(json_text)
-    if isfile(json_text):
-        with open(json_text, 'r') as fp:
+    if _looks_like_path(json_text) and isfile(json_text):
+        with open_path(json_text, 'rt') as fp:
+            if stream:
+                yield from _yield_objs_from_json_reader(
+                    fp.read, pos, decoder, buffer_size, loads, skip_errors, skipped
+                )
+                return
             json_text = fp.read()
+    if skip_errors:
+        yield from _yield_objs_from_json_reader(
+            _get_buffer_read_func(json_text), pos, decoder, buffer_size, loads,
+            skip_errors, skipped
+        )
+        return
+    if loads is not None:
+        pos = yield from _yield_objs_from_json_lines(json_text, pos, loads)
     while True:
         match = RX_NOT_WHITESPACE.search(json_text, pos)
         if not match:
@@ -354,57 +628,998 @@ def yield_objs_from_json(json_text, pos=0, decoder=JSONDecoder(), cleaned=False)
             except:
                 raise e
             else:
+                if keys or ignore:
+                    obj = decoder.project(obj)
                 yield obj
                 break
         yield obj
 
 
-def get_obj_from_json(json_text, cleaned=False):
+class _PrunedDict(dict):
+    """Dict decoded by _ProjectingDecoder with some of its keys dropped"""
+
+
+class _ProjectingDecoder(JSONDecoder):
+    """JSONDecoder that returns records with only some keys (or without some keys)
+
+    - keys: key names to keep, like filter_keys (nested keys supported)
+    - ignore: key names to drop, like ignore_keys (no nested keys)
+
+    A record is a top-level object, or an object in a top-level array (other
+    values are returned as is).
+
+    With keys, every object being decoded drops the keys that are not one of
+    the parts of the key names, so unneeded parts of a record are freed as soon
+    as the object holding them is done. A key that ends a key name may hold an
+    object, which would then be missing some keys, so if any such value was
+    pruned, the record is decoded again without pruning, and pruning is turned
+    off for the rest of the records. For a top-level array, the first record
+    is checked before the whole array is decoded
+    """
+    def __init__(self, keys=None, ignore=None):
+        if keys and ignore:
+            raise ValueError('keys and ignore can not both be used')
+        if keys:
+            keys = get_list_from_arg_strings(keys)
+            names = {name for key in keys for name in key.split('.')}
+
+            def prune(pairs):
+                obj = {key: value for key, value in pairs if key in names}
+                return obj if len(obj) == len(pairs) else _PrunedDict(obj)
+
+            super(_ProjectingDecoder, self).__init__(object_pairs_hook=prune)
+            self.record_func = _get_filter_keys_func(keys)
+            self.trie = _build_key_trie(keys)
+            self.pruning = True
+            self._checked = False
+        else:
+            super(_ProjectingDecoder, self).__init__()
+            self.record_func = _get_ignore_keys_func(ignore, copy='none')
+            self.trie = None
+            self.pruning = False
+            self._checked = True
+
+    def project(self, obj):
+        """Return obj (a decoded value) with record_func used on its records"""
+        if isinstance(obj, dict):
+            return self.record_func(obj)
+        elif type(obj) == list:
+            record_func = self.record_func
+            return [record_func(x) if isinstance(x, dict) else x for x in obj]
+        return obj
+
+    def raw_decode(self, s, idx=0):
+        if not self._checked:
+            self._checked = True
+            if s[idx:idx + 1] == '[':
+                self._check_first_record(s, idx + 1)
+        if not self.pruning:
+            obj, end = JSON_DECODER.raw_decode(s, idx)
+            return self.project(obj), end
+        obj, end = super(_ProjectingDecoder, self).raw_decode(s, idx)
+        if _is_pruned_too_much(obj, self.trie):
+            self.pruning = False
+            obj = JSON_DECODER.raw_decode(s, idx)[0]
+        return self.project(obj), end
+
+    def _check_first_record(self, s, idx):
+        """Turn off pruning if the first object in an array (after idx) needs
+        a value that pruning would change
+        """
+        match = RX_NOT_WHITESPACE.search(s, idx)
+        if not match or s[match.start()] != '{':
+            return
+        try:
+            obj = super(_ProjectingDecoder, self).raw_decode(s, match.start())[0]
+        except JSONDecodeError:
+            return
+        if _is_pruned_too_much(obj, self.trie):
+            self.pruning = False
+
+
+def _is_pruned_too_much(obj, trie):
+    """Return True if a value that a record needs was pruned by _ProjectingDecoder
+
+    - obj: a value decoded by _ProjectingDecoder (before project is used)
+    - trie: prefix trie of the key names (from _build_key_trie)
+
+    Values at the end of a key name (and non-record items of a top-level
+    array) must not hold a _PrunedDict
+    """
+    if isinstance(obj, dict):
+        stack = [(obj, trie)]
+    elif type(obj) == list:
+        stack = [(x, trie) for x in obj if isinstance(x, dict)]
+        if _has_pruned_dict([x for x in obj if not isinstance(x, dict)]):
+            return True
+    else:
+        return False
+    while stack:
+        value, children = stack.pop()
+        if type(value) in (list, tuple):
+            stack.extend([(x, children) for x in value])
+            continue
+        if not isinstance(value, dict):
+            continue
+        for key, (key_dunders, grandchildren) in children.items():
+            if key not in value:
+                continue
+            child = value[key]
+            if key_dunders and _has_pruned_dict(child):
+                return True
+            if grandchildren:
+                stack.append((child, grandchildren))
+    return False
+
+
+def _has_pruned_dict(obj):
+    """Return True if there is a _PrunedDict anywhere in obj"""
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        value_type = type(value)
+        if value_type == _PrunedDict:
+            return True
+        elif value_type == dict:
+            stack.extend(value.values())
+        elif value_type == list:
+            stack.extend(value)
+    return False
+
+
+def _loads_and_project(loads, decoder, s):
+    """Return the value decoded by loads from s, with decoder.project used on it
+
+    - decoder: a _ProjectingDecoder
+
+    While the decoder is pruning, raise ValueError when s is longer than
+    JSON_PRUNE_MIN_SIZE, so the text is left to the decoder
+    """
+    if decoder.pruning and len(s) > JSON_PRUNE_MIN_SIZE:
+        raise ValueError('text is too long to decode without pruning')
+    return decoder.project(loads(s))
+
+
+def _get_json_loads(backend=None, decoder=JSON_DECODER):
+    """Return the loads func of a JSON backend, or None if only decoder should be used
+
+    - backend: one of JSON_BACKENDS (default is JSON_BACKEND, unless decoder is
+      not the default JSON_DECODER)
+    - decoder: the JSONDecoder that will be used for anything else
+    """
+    if backend is None:
+        if decoder is not JSON_DECODER:
+            return None
+        backend = JSON_BACKEND
+    try:
+        return JSON_BACKENDS[backend]
+    except KeyError:
+        raise ValueError('backend must be one of {}, not {}'.format(
+            ', '.join([repr(name) for name in sorted(JSON_BACKENDS)]), repr(backend)
+        ))
+
+
+def _yield_objs_from_json_lines(json_text, pos, loads):
+    """Yield objects decoded with a JSON backend's loads func from json_text
+
+    The whole text (from pos) is tried first, then each line. Returns the
+    position of the first line that could not be decoded (or the end of
+    json_text), so a JSONDecoder can take over from there
+    """
+    if _has_long_digit_run(json_text):
+        return pos
+    try:
+        obj = loads(json_text[pos:] if pos else json_text)
+    except Exception:
+        pass
+    else:
+        yield obj
+        return len(json_text)
+    end = len(json_text)
+    while pos < end:
+        line_end = json_text.find('\n', pos)
+        if line_end == -1:
+            line_end = end
+        line = json_text[pos:line_end]
+        if line and not line.isspace():
+            try:
+                obj = loads(line)
+            except Exception:
+                return pos
+            yield obj
+        pos = line_end + 1
+    return end
+
+
+def _count_lines(text, end, offset, lines):
+    """Return (number of newlines, position of the last newline) for the text
+    before end, added to lines for the text before it
+
+    - text: a string that starts at offset in the whole text
+    - end: position in text to stop counting at
+    - offset: position of text in the whole text
+    - lines: tuple of (number of newlines, position of the last newline, or -1)
+      before offset
+    """
+    last = text.rfind('\n', 0, end)
+    if last == -1:
+        return lines
+    return (lines[0] + text.count('\n', 0, end), offset + last)
+
+
+def _get_json_error_at_offset(e, text, offset, lines):
+    """Return a JSONDecodeError like e (raised decoding text), with the position,
+    line, and column in the whole text that text starts at offset in
+
+    - lines: tuple of (number of newlines, position of the last newline, or -1)
+      before offset (see _count_lines)
+    """
+    count, last = _count_lines(text, e.pos, offset, lines)
+    error = JSONDecodeError(e.msg, text, e.pos)
+    error.pos = offset + e.pos
+    error.lineno = count + 1
+    error.colno = error.pos - last
+    error.args = ('{}: line {} column {} (char {})'.format(
+        e.msg, error.lineno, error.colno, error.pos
+    ),)
+    return error
+
+
+def _yield_objs_from_json_reader(read, pos=0, decoder=JSON_DECODER,
+                                 buffer_size=JSON_BUFFER_SIZE, loads=None,
+                                 skip_errors=False, skipped=None):
+    """Yield converted JSON objects for stacked JSON objects from a read func
+
+    - read: a func that accepts a number of characters and returns a string
+      (empty at the end), like the read method of a text file
+    - pos: number of characters to skip first
+    - decoder: a JSONDecoder
+    - buffer_size: number of characters to read at a time
+    - loads: loads func of a JSON backend to try on each complete line first
+      (not used while the buffered text has a long run of digits)
+    - skip_errors: if True, skip an object that can't be decoded when there is
+      a line that starts with { or [ after the error (or at the end)
+    - skipped: a list to append (offset, length) to for each skipped part
+
+    When an object can't be decoded from what is buffered (or it is a number
+    that may continue past the end of the buffer), more text is read
+    and decoding is tried again from the start of that object. Each retry reads
+    at least as much as is already buffered, so a large object is only decoded
+    a few times
+
+    A JSONDecodeError that is raised has the position (and line and column) in
+    the whole text, not in the buffer
+    """
+    # offset is the position of the buffered text in the whole text, and lines
+    # is the number of newlines before it and the position of the last one
+    offset = 0
+    lines = (0, -1)
+    while pos > 0:
+        skipped_text = read(min(pos, buffer_size))
+        if not skipped_text:
+            return
+        lines = _count_lines(skipped_text, len(skipped_text), offset, lines)
+        offset += len(skipped_text)
+        pos -= len(skipped_text)
+    text = read(buffer_size)
+    eof = not text
+    use_loads = loads is not None and not _has_long_digit_run(text)
+    while True:
+        match = RX_NOT_WHITESPACE.search(text, pos)
+        if not match:
+            if eof:
+                return
+            lines = _count_lines(text, len(text), offset, lines)
+            offset += len(text)
+            text = read(buffer_size)
+            pos = 0
+            eof = not text
+            use_loads = loads is not None and not _has_long_digit_run(text)
+            continue
+        pos = match.start()
+        if use_loads:
+            line_end = text.find('\n', pos)
+            if line_end != -1:
+                try:
+                    obj = loads(text[pos:line_end])
+                except Exception:
+                    pass
+                else:
+                    pos = line_end + 1
+                    yield obj
+                    continue
+        try:
+            obj, end = decoder.raw_decode(text, pos)
+        except JSONDecodeError as e:
+            # (an error right at the start of such a line also means there is one)
+            if skip_errors and (eof or RX_JSON_RECORD_START.search(text, max(e.pos - 1, pos))):
+                # Skip to the next line that starts with { or [ (or the end)
+                match = RX_JSON_RECORD_START.search(text, pos)
+                end = match.end() if match else len(text)
+                if skipped is not None:
+                    skipped.append((offset + pos, end - pos))
+                pos = end
+                continue
+            if eof:
+                raise _get_json_error_at_offset(e, text, offset, lines)
+            end = None
+        else:
+            if (
+                type(obj) in (int, float) and not eof and
+                not RX_NOT_JSON_NUMBER_CHAR.search(text, end)
+            ):
+                # The number may continue in the text not read yet
+                end = None
+        if end is None:
+            more = read(max(buffer_size, len(text) - pos))
+            if more:
+                lines = _count_lines(text, pos, offset, lines)
+                offset += pos
+                text = text[pos:] + more
+                pos = 0
+                use_loads = loads is not None and not _has_long_digit_run(text)
+            else:
+                eof = True
+            continue
+        pos = end
+        yield obj
+
+
+def yield_objs_from_jsonl_parallel(path, terms='', keys=None, workers=None,
+                                   ordered=True, chunk_size=JSONL_CHUNK_SIZE,
+                                   use_threads=False, backend=None):
+    """Yield converted JSON objects from a JSONL file, decoded in a process pool
+
+    - path: path to a file with one JSON object per line
+    - terms: if specified, only yield objects where the terms are satisfied
+      (same as find_items)
+    - keys: if specified, yield a dict with only these keys (same as
+      filter_keys, after terms are checked)
+    - workers: number of processes (or threads) in the pool (default is the
+      number of CPUs)
+    - ordered: if False, yield objects from each part of the file as soon as
+      it is done, instead of in file order
+    - chunk_size: number of bytes of the file for each worker to decode at a
+      time
+    - use_threads: if True, use a thread pool instead of a process pool
+    - backend: name of the JSON library to decode lines with (one of
+      JSON_BACKENDS, default is JSON_BACKEND)
+
+    The file is split into byte ranges, and each worker decodes the lines that
+    start in its range (reading past the end of the range to finish the last
+    line). Terms and keys are applied in the workers, so only the objects that
+    are yielded are sent back
+    """
+    size = getsize(path)
+    ranges = (
+        (path, start, min(start + chunk_size, size), terms, keys, backend)
+        for start in range(0, size, chunk_size)
+    )
+    for objs in _map_in_pool(
+        _read_jsonl_range, ranges, workers=workers, use_threads=use_threads,
+        ordered=ordered
+    ):
+        for obj in objs:
+            yield obj
+
+
+def _read_jsonl_range(args):
+    """Return a list of objects for the lines that start in a byte range of a JSONL file
+
+    - args: tuple of path, start byte, end byte, find terms, filter keys, and
+      JSON backend name
+    """
+    path, start, end, terms, keys, backend = args
+    is_match = _get_find_matcher(terms) if terms else None
+    filter_func = _get_filter_keys_func(keys) if keys else None
+    with open(path, 'rb') as fp:
+        if start > 0:
+            fp.seek(start - 1)
+            if fp.read(1) != b'\n':
+                fp.readline()
+        pos = fp.tell()
+        if pos >= end:
+            return []
+        data = fp.read(end - pos)
+        if not data.endswith(b'\n'):
+            data += fp.readline()
+    decode = JSON_DECODER.decode
+    loads = _get_json_loads(backend)
+    if loads is None or _has_long_digit_run(data):
+        loads = decode
+    objs = []
+    for line in data.split(b'\n'):
+        if line.strip():
+            text = line.decode('utf-8')
+            try:
+                obj = loads(text)
+            except Exception:
+                try:
+                    obj = decode(text)
+                except ValueError as e:
+                    # JSONDecodeError holds the whole line, so send back a plain message
+                    raise ValueError('Invalid JSON at byte {} of {}: {}'.format(pos, path, e))
+            if is_match is None or is_match(obj):
+                objs.append(obj if filter_func is None else filter_func(obj))
+        pos += len(line) + 1
+    return objs
+
+
+class JsonOffsetIndex(object):
+    """Byte offsets of the objects in a stacked JSON (or JSONL) file, for random access
+
+    - path: path to a file of stacked JSON objects (or one per line)
+    - index_path: path of the sidecar file for the offsets (default is path
+      with '.idx' added); if False, the index is only kept in memory
+    - backend: name of the JSON library to decode objects with (one of
+      JSON_BACKENDS, default is JSON_BACKEND)
+
+    The offsets are kept in an array('Q') (8 bytes per object, in native byte
+    order) and saved to index_path after a header with the offset just past
+    the last indexed object, the size and mtime of the file, and a CRC-32 of
+    the last JSON_INDEX_CRC_SIZE bytes of the indexed part of the file. If
+    index_path already exists, only the part of the file after that is scanned. Call update after the file grows to
+    index the new objects
+
+    Get an object (or a list of objects for a slice) by position, and only
+    those objects are read and decoded
+    """
+    def __init__(self, path, index_path=None, backend=None):
+        self.path = path
+        self.index_path = '{}.idx'.format(path) if index_path is None else index_path
+        self._loads = _get_json_loads(backend)
+        self.offsets = array('Q')
+        self.end = 0
+        self.size = 0
+        self.mtime = 0
+        self.crc = 0
+        if self.index_path and isfile(self.index_path):
+            self._load()
+        self.update()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        count = len(self.offsets)
+        with open(self.path, 'rb') as fp:
+            if isinstance(i, slice):
+                start, stop, step = i.indices(count)
+                if step == 1:
+                    return self._read_objs(fp, start, stop)
+                return [self._read_objs(fp, j, j + 1)[0] for j in range(start, stop, step)]
+            if i < 0:
+                i += count
+            if not 0 <= i < count:
+                raise IndexError('JsonOffsetIndex index out of range')
+            return self._read_objs(fp, i, i + 1)[0]
+
+    def __repr__(self):
+        return '<JsonOffsetIndex {} objects in {}>'.format(len(self.offsets), repr(self.path))
+
+    def update(self):
+        """Index the objects added to the end of the file since the last update,
+        save the index, and return the number of new objects
+
+        If the size or mtime of the file changed, the CRC-32 of the end of the
+        indexed part is checked (so an update only reads a bounded amount of
+        already indexed bytes), and the file is indexed again from the start
+        if that part is gone or was changed
+        """
+        info = stat(self.path)
+        if (info.st_size, info.st_mtime_ns) == (self.size, self.mtime):
+            return 0
+        saved = len(self.offsets)
+        if info.st_size < self.end or _get_file_tail_crc32(self.path, self.end) != self.crc:
+            self.offsets = array('Q')
+            self.end = 0
+            saved = 0
+        offsets, self.end = _scan_json_offsets(self.path, self.end)
+        self.crc = _get_file_tail_crc32(self.path, self.end)
+        self.size = info.st_size
+        self.mtime = info.st_mtime_ns
+        self.offsets.extend(offsets)
+        if self.index_path:
+            self._save(saved if isfile(self.index_path) else 0)
+        return len(offsets)
+
+    def _load(self):
+        """Load the header and offsets saved in index_path (if it was saved by
+        this version)
+        """
+        header = array('Q')
+        with open(self.index_path, 'rb') as fp:
+            data = fp.read()
+        if len(data) % header.itemsize == 0:
+            header.frombytes(data[:5 * header.itemsize])
+        if len(header) == 5 and header[0] == JSON_INDEX_MAGIC:
+            _, self.end, self.size, self.mtime, self.crc = header
+            self.offsets.frombytes(data[5 * header.itemsize:])
+
+    def _save(self, start=0):
+        """Write the header and the offsets from position start to index_path"""
+        header = array('Q', [JSON_INDEX_MAGIC, self.end, self.size, self.mtime, self.crc])
+        with open(self.index_path, 'r+b' if start else 'wb') as fp:
+            header.tofile(fp)
+            fp.seek((len(header) + start) * self.offsets.itemsize)
+            self.offsets[start:].tofile(fp)
+            fp.truncate()
+
+    def _read_objs(self, fp, start, stop):
+        """Return a list of the decoded objects from position start to stop,
+        reading the file once
+        """
+        if start >= stop:
+            return []
+        offsets = self.offsets
+        ends = list(offsets[start + 1:stop + 1])
+        if len(ends) < stop - start:
+            ends.append(self.end)
+        first = offsets[start]
+        fp.seek(first)
+        data = fp.read(ends[-1] - first)
+        return [
+            self._decode(data[offset - first:end - first])
+            for offset, end in zip(offsets[start:stop], ends)
+        ]
+
+    def _decode(self, data):
+        """Return the object decoded from the bytes of one object"""
+        if self._loads is not None and not _has_long_digit_run(data):
+            try:
+                return self._loads(data)
+            except Exception:
+                pass
+        return JSON_DECODER.decode(data.decode('utf-8'))
+
+
+def _get_file_tail_crc32(path, end, size=JSON_INDEX_CRC_SIZE):
+    """Return the CRC-32 of the (at most) size bytes of a file before end"""
+    start = max(end - size, 0)
+    with open(path, 'rb') as fp:
+        fp.seek(start)
+        return zlib.crc32(fp.read(end - start))
+
+
+def _scan_json_offsets(path, start=0, buffer_size=JSON_BUFFER_SIZE):
+    """Return an array('Q') of the byte offsets of each complete JSON object in
+    a file (from byte start), and the byte offset just past the last one
+
+    - path: path to a file of stacked JSON objects (or one per line)
+    - start: byte offset to start from (the start of an object, or whitespace)
+    - buffer_size: number of characters to read at a time
+
+    An object that is not complete at the end of the file is left for a later
+    scan, but ValueError is raised for one that is followed by more objects
+    (i.e. a line that starts with { or [)
+    """
+    offsets = array('Q')
+    with open(path, 'rb') as fp:
+        fp.seek(start)
+        read = _get_text_read_func(fp.read)
+        text = read(buffer_size)
+        eof = not text
+        pos = 0
+        byte_pos = end = start
+        while True:
+            match = RX_NOT_WHITESPACE.search(text, pos)
+            if not match:
+                if eof:
+                    break
+                byte_pos += len(text[pos:].encode('utf-8'))
+                text = read(buffer_size)
+                pos = 0
+                eof = not text
+                continue
+            byte_pos += len(text[pos:match.start()].encode('utf-8'))
+            pos = match.start()
+            try:
+                obj, obj_end = JSON_DECODER.raw_decode(text, pos)
+            except JSONDecodeError as e:
+                # A line that starts with { or [ after the error (or right at
+                # it) means this object will never be complete
+                if RX_JSON_RECORD_START.search(text, max(e.pos - 1, pos)):
+                    raise ValueError('Invalid JSON at byte {} of {}: {}'.format(byte_pos, path, e.msg))
+                if eof:
+                    break
+                obj_end = None
+            else:
+                if (
+                    type(obj) in (int, float) and not eof and
+                    not RX_NOT_JSON_NUMBER_CHAR.search(text, obj_end)
+                ):
+                    obj_end = None
+            if obj_end is None:
+                more = read(max(buffer_size, len(text) - pos))
+                if more:
+                    text = text[pos:] + more
+                    pos = 0
+                else:
+                    eof = True
+                continue
+            offsets.append(byte_pos)
+            byte_pos += len(text[pos:obj_end].encode('utf-8', 'surrogatepass'))
+            pos = obj_end
+            end = byte_pos
+    return offsets, end
+
+
+def get_obj_from_json(json_text=None, cleaned=False, backend=None, source=None,
+                      keys=None, ignore=None):
     """Return converted JSON object for JSON object in a string or file
 
     - cleaned: if True, don't clean xml_text with _clean_obj_string_for_parsing
+    - backend: name of the JSON library to decode with (see yield_objs_from_json)
+    - source: use instead of json_text for a file path, an open file, or a
+      bytes-like buffer (see yield_objs_from_json)
+    - keys: key names to keep in each record (see yield_objs_from_json)
+    - ignore: key names to drop from each record (see yield_objs_from_json)
 
     If there are stacked JSON objects in the string/file, only the first
     is returned
     """
-    res = yield_objs_from_json(json_text, cleaned=cleaned)
+    res = yield_objs_from_json(
+        json_text, cleaned=cleaned, backend=backend, source=source, keys=keys,
+        ignore=ignore
+    )
     obj = next(res)
     if obj:
         return obj
 
 
-def get_obj_from_xml(xml_text, convention='BadgerFish', warn=True, cleaned=False, **kwargs):
-    """Return an object from an XML string or file
+def get_obj_from_xml(xml_text=None, convention='BadgerFish', warn=True, cleaned=False,
+                     source=None, **kwargs):
+    """Return an object from an XML string or file (which may be gzip, bz2, or
+    xz compressed, see open_path)
 
     - convention: an allowed type of xml parsing to do (from xmljson package)
         - Abdera, BadgerFish, Cobra, GData, Parker, Yahoo
-    - warn: if True, and xmljson is not found, print a message
+        - BadgerFish and Parker are built in (same output as xmljson, without
+          needing it)
+    - warn: if True, and xmljson is needed but not found, print a message
     - cleaned: if True, don't clean xml_text with _clean_obj_string_for_parsing
+    - source: use instead of xml_text for a file path, an open file (binary or
+      text), or a bytes, bytearray, memoryview, or mmap object
+        - fed to the XML parser XML_BUFFER_SIZE bytes at a time (no cleaning,
+          and the whole payload is never copied)
     - other kwargs are passed to the xmljson.<convention> init method
         - dict_type=dict (to use a regular dict over default collections.OrderedDict
         - invalid_tags='drop' (to drop any invalid tags)
 
     See: https://github.com/sanand0/xmljson#conventions
     """
-    if xmljson is None:
+    data_func = _get_xml_data_func(convention, warn, **kwargs)
+    if data_func is None:
+        return
+    if source is not None:
+        obj = _parse_xml_source(source)
+    else:
+        if not cleaned:
+            xml_text = _clean_obj_string_for_parsing(xml_text)
+        if _looks_like_path(xml_text) and isfile(xml_text):
+            with open_path(xml_text, 'rt') as fp:
+                xml_text = fp.read()
+        obj = xml_fromstring(xml_text)
+    return data_func(obj)
+
+
+def _parse_xml_source(source, buffer_size=XML_BUFFER_SIZE):
+    """Return the root Element of an XML document from a file path, open file,
+    or bytes-like buffer
+
+    - source: anything _open_source accepts
+    - buffer_size: number of bytes (or characters) to feed the parser at a time
+    """
+    parser = XMLParser()
+    with _open_source(source, binary=not _is_text_file(source)) as read:
+        data = read(buffer_size)
+        while data:
+            parser.feed(data)
+            data = read(buffer_size)
+    return parser.close()
+
+
+def _is_text_file(source):
+    """Return True if source is a file object opened in text mode"""
+    return hasattr(source, 'read') and type(source.read(0)) == str
+
+
+def iter_objs_from_xml(source, path='records/record', convention='BadgerFish', warn=True,
+                       buffer_size=XML_BUFFER_SIZE, **kwargs):
+    """Yield an object for each element matching path in an XML document,
+    using constant memory
+
+    - source: a file path, an open file (binary or text), or a bytes,
+      bytearray, memoryview, or mmap object
+    - path: slash-separated tags that end the path of the elements to yield
+      (i.e. 'records/record' matches every <record> whose parent is <records>)
+        - a plain tag matches that local name in any namespace (or none), a
+          '{namespace}tag' only matches in that namespace, and a '{}tag' only
+          matches without a namespace
+    - convention: an allowed type of xml parsing to do (see get_obj_from_xml)
+    - warn: if True, and xmljson is needed but not found, print a message
+    - buffer_size: number of bytes (or characters) to feed the parser at a time
+    - other kwargs are passed to the xmljson.<convention> init method
+
+    Each matching element is converted as soon as its end tag is parsed, then
+    cleared and detached from its parent (so the tree never grows)
+    """
+    data_func = _get_xml_data_func(convention, warn, **kwargs)
+    if data_func is None:
+        return
+    for elem in _iter_xml_elements(source, path, buffer_size):
+        yield data_func(elem)
+
+
+def _iter_xml_elements(source, path, buffer_size=XML_BUFFER_SIZE):
+    """Yield each complete Element whose tag path ends with path, clearing it
+    (and every other finished element) once the consumer moves on
+
+    - source: anything _open_source accepts
+    - path: slash-separated tags that end the path of the elements to yield
+      (see _xml_tag_matches)
+    - buffer_size: number of bytes (or characters) to feed the parser at a time
+
+    Elements nested inside a matching element are left alone until the
+    matching element is done
+    """
+    tags = [tag for tag in path.split('/') if tag]
+    if not tags:
+        raise ValueError('path must have at least one tag')
+    depth = len(tags)
+    parser = XMLPullParser(events=('start', 'end'))
+    stack = []
+    match_depth = None
+    with _open_source(source, binary=not _is_text_file(source)) as read:
+        data = read(buffer_size)
+        while True:
+            if data:
+                parser.feed(data)
+            else:
+                parser.close()
+            for event, elem in parser.read_events():
+                if event == 'start':
+                    if (
+                        match_depth is None and len(stack) + 1 >= depth and
+                        (elem.tag == tags[-1] or _xml_tag_matches(elem.tag, tags[-1]))
+                    ):
+                        parents = [e.tag for e in stack[len(stack) + 1 - depth:]]
+                        if parents == tags[:-1] or all([
+                            _xml_tag_matches(tag, name) for tag, name in zip(parents, tags)
+                        ]):
+                            match_depth = len(stack)
+                    stack.append(elem)
+                    continue
+                stack.pop()
+                if match_depth is not None:
+                    if len(stack) > match_depth:
+                        continue
+                    match_depth = None
+                    yield elem
+                elem.clear()
+                if stack:
+                    stack[-1].remove(elem)
+            if not data:
+                break
+            data = read(buffer_size)
+
+
+def _xml_tag_matches(tag, name):
+    """Return True if an Element's tag matches a tag name from a path
+
+    - tag: an Element tag (i.e. 'record' or '{urn:example}record')
+    - name: a plain tag name (matches the local name in any namespace), a
+      '{namespace}tag' (matches exactly), or a '{}tag' (matches only without
+      a namespace)
+    """
+    if name[:1] != '{':
+        return tag[tag.rfind('}') + 1:] == name
+    if name[:2] == '{}':
+        return tag == name[2:]
+    return tag == name
+
+
+def _get_xml_data_func(convention='BadgerFish', warn=True, **kwargs):
+    """Return the func that converts an Element for convention, or None if it
+    needs xmljson and xmljson is not installed
+
+    - convention: an allowed type of xml parsing to do (see get_obj_from_xml)
+    - warn: if True, and xmljson is needed but not found, print a message
+    - kwargs: passed to the converter's init
+
+    Funcs are cached per convention and kwargs (see XML_CONVERTER_CACHE_SIZE)
+    """
+    assert convention in XML_CONVENTIONS
+    if convention not in _XML_CONVERTERS and xmljson is None:
         if warn:
             print('Could not find xmljson. Try to install with: pip3 install xmljson')
         return
-    if not cleaned:
-        xml_text = _clean_obj_string_for_parsing(xml_text)
-    if isfile(xml_text):
-        with open(xml_text, 'r') as fp:
-            xml_text = fp.read()
-    assert convention in ('Abdera', 'BadgerFish', 'Cobra', 'GData', 'Parker', 'Yahoo')
-    parser = getattr(xmljson, convention)(**kwargs)
-    obj = xml_fromstring(xml_text)
-    return parser.data(obj)
+    kwargs = tuple(sorted(kwargs.items()))
+    get_func = _get_cached_xml_data_func
+    try:
+        hash(kwargs)
+    except TypeError:
+        get_func = _get_cached_xml_data_func.__wrapped__
+    return get_func(convention, kwargs)
+
+
+@lru_cache(maxsize=XML_CONVERTER_CACHE_SIZE)
+def _get_cached_xml_data_func(convention, kwargs):
+    """Return the func that converts an Element for convention
+
+    - kwargs: tuple of (name, value) pairs for the converter's init
+    """
+    if convention in _XML_CONVERTERS:
+        return _XML_CONVERTERS[convention](**dict(kwargs))
+    return getattr(xmljson, convention)(**dict(kwargs)).data
+
+
+@lru_cache(maxsize=FROM_STRING_CACHE_SIZE)
+def _xml_from_string(val):
+    """Return None, bool, int, or float from an XML text or attribute string,
+    the same way xmljson does (results are cached)
+    """
+    if val is None:
+        return None
+    lowered = val.lower()
+    if lowered == 'true':
+        return True
+    elif lowered == 'false':
+        return False
+    try:
+        return int(val)
+    except ValueError:
+        pass
+    try:
+        num = float(val)
+    except ValueError:
+        return val
+    if float('-inf') < num < float('inf'):
+        return num
+    return val
 
 
-def string_to_obj(s, convention='BadgerFish', **kwargs):
+def _get_xml_from_string_func(xml_fromstring=True):
+    """Return the func to convert XML strings with (like xmljson's xml_fromstring)
+
+    - xml_fromstring: True to convert to None, bool, int, or float; a func to
+      call on each string; or False to keep strings
+    """
+    if callable(xml_fromstring):
+        return xml_fromstring
+    elif not xml_fromstring:
+        return lambda val: val
+    return _xml_from_string
+
+
+def _check_xml_converter_kwargs(invalid_tags=None, xml_tostring=None, element=None):
+    """Raise TypeError for converter init kwargs that xmljson would reject
+
+    The other kwargs only matter when converting a dict to XML
+    """
+    if invalid_tags not in (None, 'drop'):
+        raise TypeError('invalid_tags can be "drop" or None, not "%s"' % invalid_tags)
+
+
+def _get_xml_add_children_func(get_value, make_list):
+    """Return a func that adds the converted children of an element to a dict
+
+    - get_value: func that converts one child element
+    - make_list: list class to use for repeated tags
+
+    Each tag becomes one key (where it first appears), holding the converted
+    child, or a list of them if the tag is repeated
+    """
+    def add_children(value, children):
+        repeated = set()
+        for child in children:
+            tag = child.tag
+            if tag in repeated:
+                value[tag].append(get_value(child))
+            elif tag in value:
+                values = make_list()
+                values.append(value[tag])
+                values.append(get_value(child))
+                value[tag] = values
+                repeated.add(tag)
+            else:
+                value[tag] = get_value(child)
+
+    return add_children
+
+
+def _get_badgerfish_func(xml_fromstring=True, dict_type=None, list_type=None,
+                         simple_text=False, **kwargs):
+    """Return a func that converts an Element using the BadgerFish convention
+
+    - xml_fromstring: see _get_xml_from_string_func
+    - dict_type: dict class to use (default collections.OrderedDict)
+    - list_type: list class to use for repeated tags (default list)
+    - simple_text: if True, elements with only text become that text (and
+      empty elements become '')
+    - kwargs: other xmljson.BadgerFish init kwargs
+
+    Attributes become '@'-prefixed keys and text goes under '$' (output is the
+    same as xmljson.BadgerFish().data)
+    """
+    _check_xml_converter_kwargs(**kwargs)
+    from_string = _get_xml_from_string_func(xml_fromstring)
+    make_dict = OrderedDict if dict_type is None else dict_type
+    make_list = list if list_type is None else list_type
+
+    def get_value(elem):
+        children = [child for child in elem if type(child.tag) == str]
+        attrib = elem.attrib
+        value = make_dict()
+        for attr, attrval in attrib.items():
+            value['@' + attr] = from_string(attrval)
+        text = elem.text
+        if text and text.strip():
+            if simple_text and not children and not attrib:
+                value = from_string(text)
+            else:
+                value['$'] = from_string(text)
+        if children:
+            _add_children(value, children)
+        if simple_text and isinstance(value, dict) and not value:
+            value = ''
+        return value
+
+    _add_children = _get_xml_add_children_func(get_value, make_list)
+
+    def data(root):
+        return make_dict([(root.tag, get_value(root))])
+
+    return data
+
+
+def _get_parker_func(xml_fromstring=True, dict_type=None, list_type=None, **kwargs):
+    """Return a func that converts an Element using the Parker convention
+
+    - xml_fromstring: see _get_xml_from_string_func
+    - dict_type: dict class to use (default collections.OrderedDict)
+    - list_type: list class to use for repeated tags (default list)
+    - kwargs: other xmljson.Parker init kwargs
+
+    Attributes are dropped and elements with no children become their text
+    (output is the same as xmljson.Parker().data, including preserve_root)
+    """
+    for key in ('attr_prefix', 'text_content', 'simple_text'):
+        kwargs.pop(key, None)
+    _check_xml_converter_kwargs(**kwargs)
+    from_string = _get_xml_from_string_func(xml_fromstring)
+    make_dict = OrderedDict if dict_type is None else dict_type
+    make_list = list if list_type is None else list_type
+
+    def get_value(elem):
+        children = [child for child in elem if type(child.tag) == str]
+        if not children:
+            return from_string(elem.text)
+        value = make_dict()
+        _add_children(value, children)
+        return value
+
+    _add_children = _get_xml_add_children_func(get_value, make_list)
+
+    def data(root, preserve_root=False):
+        if preserve_root:
+            return make_dict([(root.tag, get_value(root))])
+        return get_value(root)
+
+    return data
+
+
+_XML_CONVERTERS = {
+    'BadgerFish': _get_badgerfish_func,
+    'Parker': _get_parker_func,
+}
+
+
+def string_to_obj(s, convention='BadgerFish', backend=None, **kwargs):
     """Return a dict or list from a string representing JSON or XML
 
     - convention: passed to get_obj_from_xml if s is xml
+    - backend: passed to get_obj_from_json if s is json
     - kwargs: passed to get_obj_from_xml if s is xml
 
     Wrapper to get_obj_from_json or get_obj_from_xml funcs
@@ -412,7 +1627,7 @@ def string_to_obj(s, convention='BadgerFish', **kwargs):
     s = _clean_obj_string_for_parsing(s)
     if s.startswith('<'):
         return get_obj_from_xml(s, cleaned=True, convention=convention, **kwargs)
-    return get_obj_from_json(s, cleaned=True)
+    return get_obj_from_json(s, cleaned=True, backend=backend)
 
 
 def string_to_version_tuple(s):
@@ -434,15 +1649,56 @@ def from_string(val, keep_num_as_string=False):
 
     Number strings with a leading "0", (except for leading "0." that happens to
     be a valid float) will be kept as strings
+
+    Results for strings that are not number-like are cached (see
+    FROM_STRING_CACHE_SIZE); number-like strings are converted directly, since
+    they are cheap to convert and usually too varied to get cache hits
     """
-    _val = val
     if type(val) != str:
-        pass
-    elif val.lower() == 'true':
+        return val
+    if keep_num_as_string:
+        return _from_string(val, True)
+    if val[:1] not in NUMBER_START_CHARS:
+        return _from_string(val, False)
+    if val.isdecimal() and len(val) < 16 and (val[0] != '0' or len(val) == 1):
+        return int(val)
+    if val[0] == '0' and len(val) > 1 and val[1] != '.':
+        return val
+    try:
+        num = float(val)
+    except ValueError:
+        return _number_from_string(val)
+    if num.is_integer() and '.' not in val:
+        return int(num)
+    return num
+
+
+def _number_from_string(val):
+    """Return the from_string conversion of a string that starts like a number"""
+    if val[0] == '0' and len(val) > 1 and val[1] != '.':
+        return val
+    try:
+        num = float(val)
+    except ValueError:
+        try:
+            return int(val)
+        except ValueError:
+            return val
+    if num.is_integer() and '.' not in val:
+        return int(num)
+    return num
+
+
+@lru_cache(maxsize=FROM_STRING_CACHE_SIZE)
+def _from_string(val, keep_num_as_string=False):
+    """Return the from_string conversion of a string (results are cached)"""
+    _val = val
+    lowered = val.lower()
+    if lowered == 'true':
         val = True
-    elif val.lower() == 'false':
+    elif lowered == 'false':
         val = False
-    elif val.lower() == 'none':
+    elif lowered == 'none':
         val = None
     elif keep_num_as_string:
         pass
@@ -463,21 +1719,199 @@ def from_string(val, keep_num_as_string=False):
     return val
 
 
-def decode(obj, encoding='utf-8'):
-    """Decode the bytes of an object to an encoding"""
-    try:
-        return obj.decode(encoding)
-    except (AttributeError, UnicodeDecodeError):
-        return obj
+def from_strings(vals, keep_num_as_string=False):
+    """Return a list of simple bool, None, int, float (or string) values
 
+    - vals: an iterable of strings (or other values) to convert with from_string
+    - keep_num_as_string: if True, do not attempt to convert number strings to
+      int or float
 
-def make_var_name(s):
-    """Return a valid Python variable name from string"""
-    result = s.translate(TRANS_PUNC_TO_UNDERSCORE)
-    result = result.strip().replace(' ', '_')
-    if re.match('^[^_A-z]', result):
-        result = '_' + result
-    if result in keyword.kwlist:
+    Same as calling from_string on each value, without the per-value call
+    """
+    if keep_num_as_string:
+        return [from_string(val, True) for val in vals]
+    results = []
+    append = results.append
+    for val in vals:
+        if type(val) != str:
+            append(val)
+        elif val[:1] not in NUMBER_START_CHARS:
+            append(_from_string(val, False))
+        elif (
+            val.isdecimal() and len(val) < 16 and
+            (val[0] != '0' or len(val) == 1)
+        ):
+            append(int(val))
+        elif val[0] == '0' and len(val) > 1 and val[1] != '.':
+            append(val)
+        else:
+            try:
+                num = float(val)
+            except ValueError:
+                append(_number_from_string(val))
+                continue
+            append(int(num) if num.is_integer() and '.' not in val else num)
+    return results
+
+
+def _int_strings_to_values(vals):
+    """Return a list of values from strings that are expected to be int strings"""
+    results = []
+    append = results.append
+    for val in vals:
+        if type(val) == str:
+            digits = val[1:] if val[:1] == '-' else val
+            if (
+                digits.isdecimal() and len(digits) < 16 and
+                (val[0] != '0' or len(val) == 1)
+            ):
+                append(int(val))
+                continue
+        append(from_string(val))
+    return results
+
+
+def _float_strings_to_values(vals):
+    """Return a list of values from strings that are expected to be number strings"""
+    results = []
+    append = results.append
+    for val in vals:
+        if type(val) == str:
+            try:
+                _val = float(val)
+            except ValueError:
+                pass
+            else:
+                if val.startswith('0') and len(val) > 1 and not val.startswith('0.'):
+                    append(val)
+                elif _val.is_integer() and '.' not in val:
+                    append(int(_val))
+                else:
+                    append(_val)
+                continue
+        append(from_string(val))
+    return results
+
+
+def _bool_strings_to_values(vals):
+    """Return a list of values from strings that are expected to be bool strings"""
+    results = []
+    append = results.append
+    for val in vals:
+        if type(val) == str:
+            lowered = val.lower()
+            if lowered == 'true':
+                append(True)
+                continue
+            elif lowered == 'false':
+                append(False)
+                continue
+        append(from_string(val))
+    return results
+
+
+def _none_strings_to_values(vals):
+    """Return a list of values from strings that are expected to be 'none' strings"""
+    return [
+        None if type(val) == str and val.lower() == 'none' else from_string(val)
+        for val in vals
+    ]
+
+
+def _plain_strings_to_values(vals):
+    """Return a list of values from strings that are expected to stay strings"""
+    results = []
+    append = results.append
+    for val in vals:
+        if type(val) != str:
+            append(val)
+        elif val[:1] == '0' and len(val) > 1 and val[1] != '.':
+            # Number strings with a leading "0" are kept by from_string too
+            append(val)
+        elif val[:1].isalpha() and val.lower().rstrip() not in CONVERTIBLE_WORDS:
+            append(val)
+        else:
+            append(from_string(val))
+    return results
+
+
+STRING_TYPE_CONVERTERS = {
+    'int': _int_strings_to_values,
+    'float': _float_strings_to_values,
+    'bool': _bool_strings_to_values,
+    'none': _none_strings_to_values,
+    'str': _plain_strings_to_values,
+}
+
+
+def infer_string_type(vals, sample_size=100):
+    """Return the name of the type that from_string converts most of vals to
+
+    - vals: a list of strings (i.e. a column from a CSV file or Redis hashes)
+    - sample_size: number of values from the start of vals to look at
+
+    The returned name is one of 'int', 'float', 'bool', 'none', or 'str'.
+    None values do not count, so 'none' is only returned when every sampled
+    value converts to None, and a mix of int and float values is 'float'
+    """
+    kinds = set()
+    for val in islice(vals, sample_size):
+        _type = type(from_string(val))
+        if _type == bool:
+            kinds.add('bool')
+        elif _type == int:
+            kinds.add('int')
+        elif _type == float:
+            kinds.add('float')
+        elif _type != type(None):
+            kinds.add('str')
+    if not kinds:
+        return 'none'
+    if kinds == {'int', 'float'}:
+        return 'float'
+    if len(kinds) == 1:
+        return kinds.pop()
+    return 'str'
+
+
+def infer_and_convert(columns, sample_size=100):
+    """Return columns of values converted with a routine for each inferred type
+
+    - columns: a dict of column names and lists of strings, or a list of lists
+      of strings
+    - sample_size: number of values from the start of each column to use when
+      inferring its type (see infer_string_type)
+
+    Each column is converted by a routine specialized for its inferred type,
+    and only values that don't fit the inferred type go through from_string,
+    so the result is the same as calling from_string on every value
+    """
+    if isinstance(columns, dict):
+        return {
+            name: STRING_TYPE_CONVERTERS[infer_string_type(vals, sample_size)](vals)
+            for name, vals in columns.items()
+        }
+    return [
+        STRING_TYPE_CONVERTERS[infer_string_type(vals, sample_size)](vals)
+        for vals in columns
+    ]
+
+
+def decode(obj, encoding='utf-8'):
+    """Decode the bytes of an object to an encoding"""
+    try:
+        return obj.decode(encoding)
+    except (AttributeError, UnicodeDecodeError):
+        return obj
+
+
+def make_var_name(s):
+    """Return a valid Python variable name from string"""
+    result = s.translate(TRANS_PUNC_TO_UNDERSCORE)
+    result = result.strip().replace(' ', '_')
+    if re.match('^[^_A-z]', result):
+        result = '_' + result
+    if result in keyword.kwlist:
         result = '_' + result
     return result
 
@@ -487,88 +1921,217 @@ def get_keys_in_string(s):
     return cm(s).get('curly_group_list', [])
 
 
-def get_value_at_key(some_dict, key, condition=None):
-    """Return the value at a specified key (nested.key.name supported)
+@lru_cache(maxsize=KEY_PATH_CACHE_SIZE)
+def compile_key_path(key):
+    """Return a func that gets the value at a key in a dict, like get_value_at_key
 
-    - some_dict: a dict object
     - key: name of a key
         - nested keynames are supported (i.e. 'person.address.zipcode')
-    - condition: a single-variable func returning a bool
-        - if the value at the key is a list/tuple, the result will be a list
-          where items meet the specified condition
-        - if the value at the key is anything else, the result will be the value
-          if the condition is met, or None
+
+    The returned func accepts a dict and an optional condition, with the same
+    rules as get_value_at_key, but the key is only split once. Funcs are cached
+    per key name (see KEY_PATH_CACHE_SIZE)
     """
     if not '.' in key:
-        _data = some_dict.get(key)
-        _data_type = type(_data)
-        if _data_type in (list, tuple):
-            if condition:
-                _data = [x for x in filter(condition, _data)]
-            _data_len = len(_data)
-            if _data_len == 1:
-                _data = _data[0]
-            elif _data_len == 0:
-                _data = None
-        else:
-            if condition:
-                _data = _data if condition(_data) else None
-
-    else:
-        _key, *subkeys = key.split('.')
-        _data = some_dict.get(_key, {})
-        _data_type = type(_data)
-        for subkey in subkeys:
-            try:
-                _data = _data.get(subkey, {})
-            except AttributeError as e:
-                if _data_type in (list, tuple):
-                    if condition:
-                        _data = [x.get(subkey) for x in filter(condition, _data)]
-                    else:
-                        _data = [x.get(subkey) for x in _data]
-                    _data_len = len(_data)
-                    if _data_len == 1:
-                        _data = _data[0]
-                    elif _data_len == 0:
-                        _data = None
-                else:
+        def get_value(some_dict, condition=None):
+            _data = some_dict.get(key)
+            _data_type = type(_data)
+            if _data_type in (list, tuple):
+                if condition:
+                    _data = [x for x in filter(condition, _data)]
+                _data_len = len(_data)
+                if _data_len == 1:
+                    _data = _data[0]
+                elif _data_len == 0:
                     _data = None
             else:
                 if condition:
-                    if type(_data) in (list, tuple):
-                        _data = [x for x in filter(condition, _data)]
+                    _data = _data if condition(_data) else None
+            return _data
+
+    else:
+        _key, *subkeys = key.split('.')
+        subkeys = tuple(subkeys)
+
+        def get_value(some_dict, condition=None):
+            _data = some_dict.get(_key, {})
+            _data_type = type(_data)
+            for subkey in subkeys:
+                try:
+                    _data = _data.get(subkey, {})
+                except AttributeError as e:
+                    if _data_type in (list, tuple):
+                        if condition:
+                            _data = [x.get(subkey) for x in filter(condition, _data)]
+                        else:
+                            _data = [x.get(subkey) for x in _data]
                         _data_len = len(_data)
                         if _data_len == 1:
                             _data = _data[0]
                         elif _data_len == 0:
                             _data = None
                     else:
-                        _data = _data if condition(_data) else None
-        if _data == {}:
-            _data = None
+                        _data = None
+                else:
+                    if condition:
+                        if type(_data) in (list, tuple):
+                            _data = [x for x in filter(condition, _data)]
+                            _data_len = len(_data)
+                            if _data_len == 1:
+                                _data = _data[0]
+                            elif _data_len == 0:
+                                _data = None
+                        else:
+                            _data = _data if condition(_data) else None
+            if _data == {}:
+                _data = None
+            return _data
+
+    return get_value
+
+
+def get_value_at_key(some_dict, key, condition=None):
+    """Return the value at a specified key (nested.key.name supported)
+
+    - some_dict: a dict object
+    - key: name of a key
+        - nested keynames are supported (i.e. 'person.address.zipcode')
+    - condition: a single-variable func returning a bool
+        - if the value at the key is a list/tuple, the result will be a list
+          where items meet the specified condition
+        - if the value at the key is anything else, the result will be the value
+          if the condition is met, or None
+    """
+    return compile_key_path(key)(some_dict, condition)
+
 
-    return _data
+def extract_many(some_dicts, *keys):
+    """Return a generator of tuples of the values at keys for each dict
+
+    - some_dicts: an iterable of dict objects
+    - keys: a list of key names
+        - nested keynames are supported (i.e. 'person.address.zipcode')
+        - can also be a list of keys contained in a single string, separated
+          by one of , ; |
+    """
+    keys = get_list_from_arg_strings(keys)
+    getters = [compile_key_path(key) for key in keys]
+    for some_dict in some_dicts:
+        yield tuple([getter(some_dict) for getter in getters])
 
 
-def ignore_keys(some_dict, *keys):
+def ignore_keys(some_dict, *keys, copy='deep', inplace=False):
     """Return a dict with all keys except the specified ignore keys
 
     - some_dict: a dict object that may contain other dicts and lists
     - keys: a list of key names (NO nested key)
         - can also be a list of keys contained in a single string, separated
           by one of , ; |
+    - copy: how values are copied into the returned dict ('deep', 'shallow',
+      or 'none' to use the same objects as some_dict)
+    - inplace: if True, remove the keys from some_dict and return it (copy is
+      not used)
     """
-    keys = get_list_from_arg_strings(keys)
-    data = {
-        key: deepcopy(value)
+    return _get_ignore_keys_func(keys, copy=copy, inplace=inplace)(some_dict)
+
+
+def _get_ignore_keys_func(keys, copy='deep', inplace=False):
+    """Return a func that does ignore_keys for a dict, with keys only parsed once"""
+    keys = set(get_list_from_arg_strings(keys))
+    if inplace:
+        def ignore(some_dict):
+            for key in keys:
+                some_dict.pop(key, None)
+            return some_dict
+
+        return ignore
+
+    copy_func = _get_copy_func(copy)
+    if copy_func is None:
+        return lambda some_dict: {
+            key: value
+            for key, value in some_dict.items()
+            if key not in keys
+        }
+    return lambda some_dict: {
+        key: copy_func(value)
         for key, value in some_dict.items()
         if key not in keys
     }
-    return data
 
 
-def flatten_and_ignore_keys(some_dict, *keys):
+class IgnoreKeysView(Mapping):
+    """Read-only view of a dict that hides the specified ignore keys
+
+    - some_dict: a dict object
+    - keys: a list of key names (NO nested key)
+        - can also be a list of keys contained in a single string, separated
+          by one of , ; |
+
+    Nothing is copied, so changes to some_dict show up in the view
+    """
+    __slots__ = ('_data', '_keys')
+
+    def __init__(self, some_dict, *keys):
+        self._data = some_dict
+        self._keys = frozenset(get_list_from_arg_strings(keys))
+
+    def __getitem__(self, key):
+        if key in self._keys:
+            raise KeyError(key)
+        return self._data[key]
+
+    def __iter__(self):
+        return (key for key in self._data if key not in self._keys)
+
+    def __len__(self):
+        return len(self._data) - len([key for key in self._keys if key in self._data])
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, repr(dict(self)))
+
+
+def _get_copy_func(copy):
+    """Return the func to copy values with (or None) for a copy mode
+
+    - copy: one of 'deep', 'shallow', or 'none'
+    """
+    if copy == 'deep':
+        return deepcopy
+    elif copy == 'shallow':
+        return shallowcopy
+    elif copy == 'none':
+        return None
+    raise ValueError(
+        'copy must be one of "deep", "shallow", or "none", not {}'.format(repr(copy))
+    )
+
+
+@lru_cache(maxsize=KEY_PATH_CACHE_SIZE)
+def _compile_glob_patterns(patterns):
+    """Return a compiled regex that matches any of the shell-glob patterns (or None)
+
+    - patterns: a tuple of shell-glob patterns
+
+    Matching is the same as fnmatch (case-insensitive only where the OS
+    normalizes case for file names)
+    """
+    if not patterns:
+        return None
+    parts = []
+    for pattern in patterns:
+        rx = fnmatch_translate(pattern)
+        if rx.endswith('(?ms)'):
+            # Python 3.5 puts the flags at the end instead of in a group
+            rx = rx[:-5]
+        parts.append('(?:{})'.format(rx))
+    flags = re.DOTALL
+    if normcase('A') != 'A':
+        flags |= re.IGNORECASE
+    return re.compile('|'.join(parts), flags)
+
+
+def flatten_and_ignore_keys(some_dict, *keys, copy='deep', lists=False):
     """Return a flattened dict with all keys except the specified ignore keys
 
     - some_dict: a dict object that may contain other dicts and lists
@@ -579,45 +2142,177 @@ def flatten_and_ignore_keys(some_dict, *keys):
         - shell-glob patterns supported include '*' to match everything, '?' to
           match a single character, and '[..]' to match specific characters and
           character ranges (when 2 chars are separated by '-' in the range)
+    - copy: how values are copied into the result ('deep', 'shallow', or
+      'none' to use the same objects as some_dict)
+    - lists: if True, also flatten lists, using the item index as a key name
+      (see iter_flat_items)
+
+    All patterns are combined into a single regex, and nested dicts under an
+    ignored key are never visited
     """
-    keys = get_list_from_arg_strings(keys)
+    return _get_flatten_func(keys, copy=copy, lists=lists)(some_dict)
+
+
+def _get_flatten_func(keys, copy='deep', lists=False):
+    """Return a func that does flatten_and_ignore_keys for a dict, with keys only parsed once"""
+    rx = _compile_glob_patterns(tuple(get_list_from_arg_strings(keys)))
+    copy_func = _get_copy_func(copy)
+    if copy_func is None:
+        return lambda some_dict: dict(_iter_flat_items(some_dict, rx, lists))
+    return lambda some_dict: {
+        key: copy_func(value)
+        for key, value in _iter_flat_items(some_dict, rx, lists)
+    }
+
 
-    def _flatten(current_dict, parent_key='', result=None):
-        if result is None:
-            result = {}
+def _iter_flat_items(some_dict, rx=None, lists=False):
+    """Yield (flat key name, value) tuples for the leaf values of a dict
 
-        for k, v in current_dict.items():
+    - some_dict: a dict object that may contain other dicts and lists
+    - rx: a compiled regex (from _compile_glob_patterns) matching key names
+      to ignore
+    - lists: if True, also descend into lists, and yield empty dicts and
+      lists as values
+    """
+    stack = [('', iter(some_dict.items()))]
+    while stack:
+        parent_key, items = stack[-1]
+        for k, v in items:
             new_key = '{}.{}'.format(parent_key, k) if parent_key else k
-            if not any(fnmatch(new_key, pattern) for pattern in keys):
-                if isinstance(v, dict):
-                    _flatten(v, new_key, result)
-                else:
-                    result[new_key] = deepcopy(v)
-        return result
+            if rx is not None and rx.match(new_key):
+                continue
+            if isinstance(v, dict):
+                if lists and not v:
+                    yield new_key, v
+                    continue
+                stack.append((new_key, iter(v.items())))
+                break
+            if lists and type(v) == list:
+                if not v:
+                    yield new_key, v
+                    continue
+                stack.append((new_key, enumerate(v)))
+                break
+            yield new_key, v
+        else:
+            stack.pop()
 
-    return _flatten(some_dict)
 
+def iter_flat_items(some_dict, *keys, lists=False):
+    """Return a generator of (flat key name, value) tuples for a nested dict
 
-def unflatten_keys(flat_dict):
+    - some_dict: a dict object that may contain other dicts and lists
+    - keys: a list of key names or shell-glob style key patterns to ignore
+      (same rules as flatten_and_ignore_keys)
+    - lists: if True, also descend into lists, using the item index as a key
+      name (i.e. 'person.phones.0.number'), and yield empty dicts and lists as
+      values so nothing is lost
+
+    Nothing is copied, and extra memory only depends on how deeply nested
+    some_dict is. The pairs can be passed to dict() and unflatten_keys
+    """
+    rx = _compile_glob_patterns(tuple(get_list_from_arg_strings(keys)))
+    return _iter_flat_items(some_dict, rx, lists)
+
+
+def unflatten_keys(flat_dict, lists=False):
     """Return a dict with un-nested key names and nested dicts where appropriate
 
     - flat_dict: a dict object containing no nested dicts, where nested keynames
       are supported (i.e. 'person.address.zipcode')
+    - lists: if True, nested dicts whose key names are exactly the list indexes
+      0 to n-1 (i.e. 'person.phones.0.number') are made into lists (see
+      unflatten_many)
     """
-    data = {}
+    return _unflatten_with_plan(flat_dict, _get_unflatten_plan(tuple(flat_dict), lists))
+
+
+def unflatten_many(flat_dicts, lists=False):
+    """Return a generator of dicts with un-nested key names (see unflatten_keys)
+
+    - flat_dicts: an iterable of flat dict objects (i.e. from flatten_and_ignore_keys
+      or dict(iter_flat_items(...)))
+    - lists: if True, nested dicts whose key names are exactly the list indexes
+      0 to n-1 are made into lists, which undoes flattening with lists=True
+      (unless the original had dicts with key names like '0', '1', ...)
+
+    The split key names and the shape to build are worked out once for each
+    distinct set of keys and reused for every dict that has the same keys
+    """
+    for flat_dict in flat_dicts:
+        yield _unflatten_with_plan(flat_dict, _get_unflatten_plan(tuple(flat_dict), lists))
+
+
+def _is_list_index(key):
+    """Return True if key is a string that flattening a list could have made"""
+    return key.isdigit() and (key == '0' or not key.startswith('0'))
 
-    for compound_key, value in flat_dict.items():
-        keys = compound_key.split('.')
-        current_level = data
 
-        for i, key in enumerate(keys):
-            if i == len(keys) - 1:
-                current_level[key] = value
+@lru_cache(maxsize=UNFLATTEN_PLAN_CACHE_SIZE)
+def _get_unflatten_plan(compound_keys, lists=False):
+    """Return a tuple of (compound key, steps) tuples to build a nested dict
+
+    - compound_keys: a tuple of key names from a flat dict
+    - lists: if True, use lists for nested dicts whose keys are exactly the
+      list indexes 0 to n-1
+
+    Each step is a tuple of a key name (or int index) and the func that makes
+    the container for the next step (None for the last step)
+    """
+    paths = [tuple(compound_key.split('.')) for compound_key in compound_keys]
+    list_paths = set()
+    if lists:
+        child_keys = defaultdict(set)
+        for path in paths:
+            for i in range(1, len(path)):
+                child_keys[path[:i]].add(path[i])
+        list_paths = set([
+            parent
+            for parent, keys in child_keys.items()
+            if all([_is_list_index(key) for key in keys]) and
+            max([int(key) for key in keys]) == len(keys) - 1
+        ])
+
+    plan = []
+    for compound_key, path in zip(compound_keys, paths):
+        steps = []
+        last = len(path) - 1
+        for i, key in enumerate(path):
+            if path[:i] in list_paths:
+                key = int(key)
+            if i == last:
+                make = None
+            elif path[:i + 1] in list_paths:
+                make = list
             else:
-                if key not in current_level:
-                    current_level[key] = {}
-                current_level = current_level[key]
+                make = dict
+            steps.append((key, make))
+        plan.append((compound_key, tuple(steps)))
+    return tuple(plan)
+
 
+def _unflatten_with_plan(flat_dict, plan):
+    """Return a nested dict from a flat dict and a plan from _get_unflatten_plan"""
+    data = {}
+    for compound_key, steps in plan:
+        current_level = data
+        for key, make in steps:
+            if type(current_level) == list:
+                if len(current_level) <= key:
+                    current_level.extend([None] * (key + 1 - len(current_level)))
+                if make is None:
+                    current_level[key] = flat_dict[compound_key]
+                else:
+                    if current_level[key] is None:
+                        current_level[key] = make()
+                    current_level = current_level[key]
+            else:
+                if make is None:
+                    current_level[key] = flat_dict[compound_key]
+                else:
+                    if key not in current_level:
+                        current_level[key] = make()
+                    current_level = current_level[key]
     return data
 
 
@@ -636,35 +2331,148 @@ def filter_keys(some_dict, *keys, **conditions):
           where items meet the specified condition
         - if the value at the key is anything else, the result will be the value
           if the condition is met, or None
+
+    The func for the keys is cached when there are no conditions (see
+    FILTER_KEYS_CACHE_SIZE)
     """
-    keys = get_list_from_arg_strings(keys)
-    data = {}
-    for key in keys:
+    if conditions:
+        return _get_filter_keys_func(keys, conditions)(some_dict)
+    try:
+        func = _get_cached_filter_keys_func(keys)
+    except TypeError:
+        func = _get_cached_filter_keys_func(tuple(get_list_from_arg_strings(keys)))
+    return func(some_dict)
+
+
+@lru_cache(maxsize=FILTER_KEYS_CACHE_SIZE)
+def _get_cached_filter_keys_func(keys):
+    """Return the func from _get_filter_keys_func for a tuple of keys (cached)"""
+    return _get_filter_keys_func(keys)
+
+
+def _get_filter_keys_func(keys, conditions=None):
+    """Return a func that does filter_keys for a dict, with keys only parsed once
+
+    Each key is looked up with its func from compile_key_path
+    """
+    conditions = conditions or {}
+    getters = []
+    for key in get_list_from_arg_strings(keys):
         key_dunder = key.replace('.', '__')
-        condition = conditions.get(key_dunder)
-        data[key_dunder] = get_value_at_key(some_dict, key, condition)
-    return data
+        getters.append((key_dunder, compile_key_path(key), conditions.get(key_dunder)))
+
+    def filter_func(some_dict):
+        data = {}
+        for key_dunder, get_value, condition in getters:
+            data[key_dunder] = get_value(some_dict, condition)
+        return data
 
+    return filter_func
 
-def rename_keys(some_dict, **mapping):
+
+def _build_key_trie(keys):
+    """Return a prefix trie for nested key names
+
+    - keys: a list of nested key names (i.e. 'person.address.zipcode')
+
+    Each node is a tuple of the output key names (using '__' instead of '.')
+    that end at the node and a dict of child nodes
+    """
+    trie = {}
+    for key in keys:
+        _key, *subkeys = key.split('.')
+        node = trie.setdefault(_key, ([], {}))
+        for subkey in subkeys:
+            node = node[1].setdefault(subkey, ([], {}))
+        node[0].append(key.replace('.', '__'))
+    return trie
+
+
+def rename_keys(some_dict, _copy='deep', _inplace=False, **mapping):
     """Return a dict with the key names mapped from some_dict
 
     - some_dict: a dict object
+    - _copy: how values are copied into the returned dict ('deep', 'shallow',
+      or 'none' to use the same objects as some_dict)
+    - _inplace: if True, rename the keys of some_dict and return it (_copy is
+      not used)
     - mapping: names of keys in some_dict and what the new name should be
     """
+    copy_func = None if _inplace else _get_copy_func(_copy)
     new_dict = {}
     for k, v in some_dict.items():
         key = mapping.get(k, k)
-        new_dict[key] = deepcopy(v)
+        new_dict[key] = copy_func(v) if copy_func else v
+    if _inplace:
+        some_dict.clear()
+        some_dict.update(new_dict)
+        return some_dict
     return new_dict
 
 
-def cast_keys(some_dict, **casting):
+class RenameKeysView(Mapping):
+    """Read-only view of a dict with the key names mapped from some_dict
+
+    - some_dict: a dict object
+    - mapping: names of keys in some_dict and what the new name should be
+
+    Nothing is copied, so changes to some_dict show up in the view
+    """
+    __slots__ = ('_data', '_mapping', '_sources')
+
+    def __init__(self, some_dict, **mapping):
+        self._data = some_dict
+        self._mapping = mapping
+        self._sources = defaultdict(list)
+        for k, new_key in mapping.items():
+            self._sources[new_key].append(k)
+
+    def __getitem__(self, key):
+        sources = [
+            k for k in self._sources.get(key, []) + [key]
+            if k in self._data and self._mapping.get(k, k) == key
+        ]
+        if not sources:
+            raise KeyError(key)
+        if len(sources) > 1:
+            # Same as rename_keys: the last one in some_dict wins
+            sources = [k for k in self._data if k in sources]
+        return self._data[sources[-1]]
+
+    def __iter__(self):
+        seen = set()
+        for k in self._data:
+            key = self._mapping.get(k, k)
+            if key not in seen:
+                seen.add(key)
+                yield key
+
+    def __len__(self):
+        return len(set([self._mapping.get(k, k) for k in self._data]))
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, repr(dict(self)))
+
+
+def cast_keys(some_dict, _copy='deep', _inplace=False, **casting):
     """Return a dict where the specified keys have values cast to another type
 
     - some_dict: a dict object
+    - _copy: how values that are not cast are copied into the returned dict
+      ('deep', 'shallow', or 'none' to use the same objects as some_dict)
+    - _inplace: if True, replace the values in some_dict and return it (_copy
+      is not used)
     - casting: names of keys in some_dict and the function to cast its value
     """
+    if _inplace:
+        for k, func in casting.items():
+            if func and k in some_dict:
+                try:
+                    some_dict[k] = func(some_dict[k])
+                except:
+                    pass
+        return some_dict
+    copy_func = _get_copy_func(_copy)
     new_dict = {}
     for k, v in some_dict.items():
         func = casting.get(k)
@@ -672,34 +2480,609 @@ def cast_keys(some_dict, **casting):
             try:
                 new_dict[k] = func(v)
             except:
-                new_dict[k] = deepcopy(v)
+                new_dict[k] = copy_func(v) if copy_func else v
         else:
-            new_dict[k] = deepcopy(v)
+            new_dict[k] = copy_func(v) if copy_func else v
     return new_dict
 
 
-def sort_by_keys(some_dicts, *keys, reverse=False):
+class CastKeysView(Mapping):
+    """Read-only view of a dict where the specified keys have values cast on access
+
+    - some_dict: a dict object
+    - casting: names of keys in some_dict and the function to cast its value
+
+    Nothing is copied or cached, so the cast function runs on every access
+    """
+    __slots__ = ('_data', '_casting')
+
+    def __init__(self, some_dict, **casting):
+        self._data = some_dict
+        self._casting = casting
+
+    def __getitem__(self, key):
+        value = self._data[key]
+        func = self._casting.get(key)
+        if func:
+            try:
+                return func(value)
+            except:
+                pass
+        return value
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, repr(dict(self)))
+
+
+_SHAPE_MISMATCH = object()
+
+
+def _get_record_shape(value):
+    """Return a hashable description of the dicts and lists nested in a value
+
+    - dicts are ('dict', type, ((key, shape), ...))
+    - lists are ('list', (shape, ...))
+    - tuples are ('seq',)
+    - anything else is None
+    """
+    if isinstance(value, dict):
+        return ('dict', type(value), tuple([
+            (k, _get_record_shape(v)) for k, v in value.items()
+        ]))
+    if type(value) == list:
+        return ('list', tuple([_get_record_shape(v) for v in value]))
+    if type(value) == tuple:
+        return ('seq',)
+    return None
+
+
+class _SourceBuilder(object):
+    """Lines of Python source for a generated func, and the objects they use"""
+    def __init__(self):
+        self.lines = []
+        self.namespace = {'_MISS': _SHAPE_MISMATCH}
+        self._names = {}
+        self._var_count = 0
+
+    def const(self, value):
+        """Return a literal or a name in the namespace for a value"""
+        if type(value) in (str, int):
+            return repr(value)
+        name = self._names.get(id(value))
+        if name is None:
+            name = '_c{}'.format(len(self._names))
+            self._names[id(value)] = name
+            self.namespace[name] = value
+        return name
+
+    def var(self):
+        """Return a new local variable name"""
+        self._var_count += 1
+        return '_v{}'.format(self._var_count)
+
+    def add(self, line):
+        self.lines.append('    ' + line)
+
+    def add_dict(self, name, entries):
+        """Add lines that build a dict from (key source, value source) tuples"""
+        self.add('{} = {{'.format(name))
+        for key, value in entries:
+            self.add('    {}: {},'.format(key, value))
+        self.add('}')
+
+    def compile(self, name):
+        """Return the generated func and its source"""
+        source = 'def {}(some_dict):\n{}\n'.format(name, '\n'.join(self.lines))
+        exec(compile(source, '<{}>'.format(name), 'exec'), self.namespace)
+        return self.namespace[name], source
+
+
+def _specialize_filter_keys(builder, shape, *keys, **conditions):
+    """Add the source for filter_keys on dicts shaped like shape and return the generic func
+
+    Nested keys are accessed directly when every dict along the path is a dict
+    in the sample record (the value at the last key can be anything)
+    """
+    keys = get_list_from_arg_strings(keys)
+    path_vars = {(): 'some_dict'}
+    dict_guarded = set([()])
+    seq_guarded = set()
+    entries = []
+
+    def get_path_var(path):
+        var = path_vars.get(path)
+        if var is None:
+            var = builder.var()
+            builder.add('{} = {}.get({})'.format(
+                var, path_vars[path[:-1]], builder.const(path[-1])
+            ))
+            path_vars[path] = var
+        return var
+
+    for key in keys:
+        key_dunder = key.replace('.', '__')
+        condition = conditions.get(key_dunder)
+        value = None
+        if condition is None:
+            path = tuple(key.split('.'))
+            node = shape
+            dict_types = []
+            for part in path[:-1]:
+                node = dict(node[2]).get(part)
+                if node is None or node[0] != 'dict':
+                    break
+                dict_types.append(node[1])
+            else:
+                last = dict(node[2]).get(path[-1])
+                if len(path) > 1 or last is None or last[0] == 'dict':
+                    for i, dict_type in enumerate(dict_types, 1):
+                        var = get_path_var(path[:i])
+                        if path[:i] not in dict_guarded:
+                            builder.add('if type({}) is not {}: return _MISS'.format(
+                                var, builder.const(dict_type)
+                            ))
+                            dict_guarded.add(path[:i])
+                    var = get_path_var(path)
+                    if len(path) == 1:
+                        if path not in dict_guarded and path not in seq_guarded:
+                            builder.add('if type({}) in (list, tuple): return _MISS'.format(var))
+                            seq_guarded.add(path)
+                        value = var
+                    else:
+                        value = 'None if {0} == {{}} else {0}'.format(var)
+        if value is None and condition is None:
+            value = '{}(some_dict)'.format(builder.const(compile_key_path(key)))
+        elif value is None:
+            value = '{}(some_dict, {})'.format(
+                builder.const(compile_key_path(key)), builder.const(condition)
+            )
+        entries.append((builder.const(key_dunder), value))
+
+    builder.add_dict('data', entries)
+    builder.add('return data')
+    return _get_filter_keys_func(keys, conditions)
+
+
+def _specialize_flatten_and_ignore_keys(builder, shape, *keys, copy='deep', lists=False):
+    """Add the source for flatten_and_ignore_keys on dicts shaped like shape and return the generic func
+
+    Every dict (and list when lists is True) must have the same keys (and
+    length) as in the sample record, and values that were not dicts (or lists)
+    must still not be
+    """
+    rx = _compile_glob_patterns(tuple(get_list_from_arg_strings(keys)))
+    copy_func = _get_copy_func(copy)
+    value_format = '{}' if copy_func is None else builder.const(copy_func) + '({})'
+    leaf_guard = 'if isinstance({0}, dict) or type({0}) is list: return _MISS'
+    if not lists:
+        leaf_guard = 'if isinstance({0}, dict): return _MISS'
+    entries = []
+
+    def visit(var, node, parent_key):
+        if node[0] == 'dict':
+            pairs = node[2]
+        else:
+            pairs = enumerate(node[1])
+        for k, child in pairs:
+            new_key = '{}.{}'.format(parent_key, k) if parent_key else k
+            if rx is not None and rx.match(new_key):
+                continue
+            child_var = builder.var()
+            builder.add('{} = {}[{}]'.format(child_var, var, builder.const(k)))
+            if child is not None and child[0] == 'dict':
+                builder.add('if type({0}) is not {1} or tuple({0}) != {2}: return _MISS'.format(
+                    child_var, builder.const(child[1]), builder.const(tuple([k for k, _ in child[2]]))
+                ))
+                if child[2]:
+                    visit(child_var, child, new_key)
+                elif lists:
+                    entries.append((builder.const(new_key), value_format.format(child_var)))
+            elif lists and child is not None and child[0] == 'list':
+                builder.add('if type({0}) is not list or len({0}) != {1}: return _MISS'.format(
+                    child_var, len(child[1])
+                ))
+                if child[1]:
+                    visit(child_var, child, new_key)
+                else:
+                    entries.append((builder.const(new_key), value_format.format(child_var)))
+            else:
+                builder.add(leaf_guard.format(child_var))
+                entries.append((builder.const(new_key), value_format.format(child_var)))
+
+    builder.add('if tuple(some_dict) != {}: return _MISS'.format(
+        builder.const(tuple([k for k, _ in shape[2]]))
+    ))
+    visit('some_dict', shape, '')
+    builder.add_dict('data', entries)
+    builder.add('return data')
+    return _get_flatten_func(keys, copy=copy, lists=lists)
+
+
+def _specialize_rename_keys(builder, shape, _copy='deep', _inplace=False, **mapping):
+    """Add the source for rename_keys on dicts shaped like shape and return the generic func
+
+    The dict must have the same keys, in the same order, as the sample record
+    """
+    copy_func = None if _inplace else _get_copy_func(_copy)
+    value_format = '{}' if copy_func is None else builder.const(copy_func) + '({})'
+    keys = tuple([k for k, _ in shape[2]])
+    builder.add('if tuple(some_dict) != {}: return _MISS'.format(builder.const(keys)))
+    builder.add_dict('data', [
+        (
+            builder.const(mapping.get(k, k)),
+            value_format.format('some_dict[{}]'.format(builder.const(k)))
+        )
+        for k in keys
+    ])
+    if _inplace:
+        builder.add('some_dict.clear()')
+        builder.add('some_dict.update(data)')
+        builder.add('return some_dict')
+    else:
+        builder.add('return data')
+    return partial(rename_keys, _copy=_copy, _inplace=_inplace, **mapping)
+
+
+_SPECIALIZERS = {
+    'filter_keys': _specialize_filter_keys,
+    'flatten_and_ignore_keys': _specialize_flatten_and_ignore_keys,
+    'rename_keys': _specialize_rename_keys,
+}
+
+
+@lru_cache(maxsize=SPECIALIZE_CACHE_SIZE)
+def _compile_specialized(operation, shape, args=(), kwargs=()):
+    """Return a tuple of the generated func, the generic func, and the source"""
+    builder = _SourceBuilder()
+    generic_func = _SPECIALIZERS[operation](builder, shape, *args, **dict(kwargs))
+    func, source = builder.compile('_specialized_{}'.format(operation))
+    return func, generic_func, source
+
+
+def specialize(sample_record, operation, *args, **kwargs):
+    """Return a SpecializedTransform that does an operation with code generated
+    for the shape of sample_record
+
+    - sample_record: a dict with the same keys (and nested dicts) as most of
+      the dicts that will be transformed
+    - operation: 'filter_keys', 'flatten_and_ignore_keys', or 'rename_keys'
+      (or one of those funcs)
+    - args: the keys for filter_keys or flatten_and_ignore_keys
+    - kwargs: the other arguments for the operation (i.e. conditions for
+      filter_keys, copy/lists for flatten_and_ignore_keys, or _copy/_inplace
+      and the mapping for rename_keys)
+
+    The generated func gets every key directly, with no globbing, after a few
+    checks on the keys and types of the dicts it goes through. Dicts that
+    don't pass the checks are given to the generic func instead. Generated
+    funcs are cached per operation, arguments, and shape (see
+    SPECIALIZE_CACHE_SIZE)
+    """
+    operation = getattr(operation, '__name__', operation)
+    if operation not in _SPECIALIZERS:
+        raise ValueError('operation must be one of {}, not {}'.format(
+            ', '.join([repr(name) for name in sorted(_SPECIALIZERS)]), repr(operation)
+        ))
+    if not isinstance(sample_record, dict):
+        raise ValueError('sample_record must be a dict, not {}'.format(type(sample_record)))
+    args = tuple(get_list_from_arg_strings(args))
+    shape = _get_record_shape(sample_record)
+    kwargs = tuple(sorted(kwargs.items()))
+    compile_func = _compile_specialized
+    try:
+        hash(kwargs)
+    except TypeError:
+        compile_func = _compile_specialized.__wrapped__
+    func, generic_func, source = compile_func(operation, shape, args, kwargs)
+    return SpecializedTransform(operation, func, generic_func, source)
+
+
+class SpecializedTransform(object):
+    """Func for one record transform, using generated code when a dict has the expected shape
+
+    - operation: name of the transform
+    - func: generated func that returns _SHAPE_MISMATCH for dicts it can't handle
+    - generic_func: func to use for those dicts
+    - source: Python source of func
+
+    Created by specialize. The fast_count and slow_count attributes are the
+    number of dicts handled by the generated func and by the generic func
+    """
+    def __init__(self, operation, func, generic_func, source):
+        self.operation = operation
+        self.source = source
+        self.fast_count = 0
+        self.slow_count = 0
+        self._func = func
+        self._generic_func = generic_func
+
+    def __call__(self, some_dict):
+        result = self._func(some_dict)
+        if result is _SHAPE_MISMATCH:
+            self.slow_count += 1
+            return self._generic_func(some_dict)
+        self.fast_count += 1
+        return result
+
+    def __repr__(self):
+        return '<{} {} fast={} slow={}>'.format(
+            self.__class__.__name__, self.operation, self.fast_count, self.slow_count
+        )
+
+
+class _Descending(object):
+    """Wrap a sort key part so that it is compared in descending order"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+def _get_sort_value(val):
+    """Return a tuple for val that can be compared to a tuple for a value of any type
+
+    None comes first, then numbers, then strings, then anything else (grouped
+    by type name)
+    """
+    if val is None:
+        return (0,)
+    _type = type(val)
+    if _type in (int, float, bool):
+        return (1, val)
+    if _type == str:
+        return (2, val)
+    return (3, _type.__name__, val)
+
+
+def _get_sort_key_func(keys, convert=False, desc=()):
+    """Return a func that will create a sort key for a dict
+
+    - keys: a list of key names
+        - nested keynames are supported (i.e. 'person.address.zipcode')
+    - convert: if True, convert values with from_string before comparing
+    - desc: a list of key names (from keys) to sort in descending order
+    """
+    desc = set(desc)
+    getters = []
+    for key in keys:
+        descending = key in desc
+        if '.' in key:
+            getter = compile_key_path(key)
+        else:
+            getter = methodcaller('get', key)
+        getters.append((getter, descending))
+
+    def sort_key(some_dict):
+        parts = []
+        for getter, descending in getters:
+            val = getter(some_dict)
+            if convert:
+                val = from_string(val)
+            val = _get_sort_value(val)
+            parts.append(_Descending(val) if descending else val)
+        return tuple(parts)
+
+    return sort_key
+
+
+def sort_by_keys(some_dicts, *keys, reverse=False, limit=None, convert=False, desc=None):
     """Sort the given list of dicts by the specified keys
 
     - some_dicts: a list of dict objects
-    - keys: a list of key names (simple names, NO nesting)
+    - keys: a list of key names
+        - nested keynames are supported (i.e. 'person.address.zipcode')
+        - can also be a list of keys contained in a single string, separated
+          by one of , ; |
     - reverse: if True, reverse/descending order
+    - limit: if specified, return a new list of the first `limit` dicts in
+      sorted order instead of sorting some_dicts in place
+        - some_dicts can be any iterable of dicts when limit is used
+    - convert: if True, compare values converted with from_string (so that
+      '10' comes after '9')
+    - desc: a key name (or list of key names, or a string of key names
+      separated by one of , ; |) from keys to sort in descending order
+        - reverse applies on top of this, flipping the order of every key
+
+    None values come first, and values of different types are grouped by type
+    (numbers, then strings, then anything else) instead of raising TypeError
     """
     keys = get_list_from_arg_strings(keys)
-    some_dicts.sort(
-        key=lambda x: tuple([x.get(k) for k in keys]),
-        reverse=reverse
-    )
+    sort_key = _get_sort_key_func(keys, convert=convert, desc=get_list_from_arg_strings(desc or ''))
+    if limit is not None:
+        if reverse:
+            return nlargest(limit, some_dicts, key=sort_key)
+        return nsmallest(limit, some_dicts, key=sort_key)
+    some_dicts.sort(key=sort_key, reverse=reverse)
 
 
-def find_items(some_dicts, terms):
-    """Return a generator containing dicts where specified terms are satisfied
+def _yield_pickled_objs(fp):
+    """Yield objects that were pickled one after another to a file object"""
+    fp.seek(0)
+    while True:
+        try:
+            yield pickle.load(fp)
+        except EOFError:
+            return
 
-    - some_dicts: a list of dict objects
-    - terms: string of 'key:value' pairs separated by any of , ; |
-        - after the ':' any of the operators defined in FIND_OPERATORS may be
-          used before the value (i.e. 'rate:>5')
-        - no operator implies the '==' operator
+
+def yield_sorted_dicts(some_dicts, *keys, reverse=False, convert=False, desc=None,
+                       run_size=100000, tmp_dir=None):
+    """Yield dicts from an iterable of dicts in sorted order, using temp files
+
+    - some_dicts: an iterable of dict objects (i.e. from yield_objs_from_json)
+    - keys: a list of key names (same rules as sort_by_keys)
+    - reverse: if True, reverse/descending order
+    - convert: if True, compare values converted with from_string
+    - desc: key names from keys to sort in descending order (same rules as
+      sort_by_keys)
+    - run_size: max number of dicts to hold in memory at once
+        - each run of dicts is sorted and pickled to a temporary file, then
+          the runs are merged lazily with heapq.merge
+    - tmp_dir: directory to create the temporary files in (default is the
+      system temp directory)
+
+    If there are no more than run_size dicts, no temporary files are used
+    """
+    keys = get_list_from_arg_strings(keys)
+    sort_key = _get_sort_key_func(keys, convert=convert, desc=get_list_from_arg_strings(desc or ''))
+    some_dicts = iter(some_dicts)
+    runs = []
+    try:
+        while True:
+            run = list(islice(some_dicts, run_size))
+            if not run:
+                break
+            run.sort(key=sort_key, reverse=reverse)
+            if not runs and len(run) < run_size:
+                yield from run
+                return
+            fp = TemporaryFile(dir=tmp_dir)
+            runs.append(fp)
+            for some_dict in run:
+                pickle.dump(some_dict, fp, pickle.HIGHEST_PROTOCOL)
+            run = None
+
+        yield from merge(
+            *[_yield_pickled_objs(fp) for fp in runs],
+            key=sort_key,
+            reverse=reverse
+        )
+    finally:
+        for fp in runs:
+            fp.close()
+
+
+def _get_trigrams(s):
+    """Return a set of the 3-character substrings of s"""
+    return set([s[i:i + 3] for i in range(len(s) - 2)])
+
+
+class TrigramIndex(object):
+    """Index the values at some keys of a list of dicts for sloppy ('$' and '~') terms
+
+    - some_dicts: a list of dict objects (should not change while indexed)
+    - keys: a list of key names
+        - nested keynames are supported (i.e. 'person.address.zipcode')
+        - can also be a list of keys contained in a single string, separated
+          by one of , ; |
+
+    The converted value and lowercase string form of each record value are
+    computed once, and every string value is indexed by its trigrams so that
+    '$' terms only need to check records that could possibly match
+
+    Pass the index to find_items with the same list of dicts it was built from
+    """
+    def __init__(self, some_dicts, *keys):
+        self.some_dicts = some_dicts
+        self.keys = get_list_from_arg_strings(keys)
+        self._values = {}
+        self._lowered = {}
+        self._trigrams = {}
+        self._lengths = {}
+        self._non_strings = {}
+        for key in self.keys:
+            values = []
+            lowered = []
+            trigrams = defaultdict(set)
+            lengths = []
+            non_strings = []
+            get_value = compile_key_path(key)
+            for i, some_dict in enumerate(some_dicts):
+                value = from_string(get_value(some_dict))
+                values.append(value)
+                if type(value) == str:
+                    _lowered = value.lower()
+                    lowered.append(_lowered)
+                    lengths.append((min(len(value), len(_lowered)), i))
+                    for trigram in _get_trigrams(_lowered):
+                        trigrams[trigram].add(i)
+                else:
+                    lowered.append(None)
+                    non_strings.append(i)
+            lengths.sort()
+            self._values[key] = values
+            self._lowered[key] = lowered
+            self._trigrams[key] = dict(trigrams)
+            self._lengths[key] = lengths
+            self._non_strings[key] = non_strings
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __len__(self):
+        return len(self.some_dicts)
+
+    def value(self, key, i):
+        """Return the converted value at key for the record at position i"""
+        return self._values[key][i]
+
+    def sloppy_equal(self, key, i, value):
+        """Return True if value sloppy-matches the record at position i ('$')"""
+        _lowered = self._lowered[key][i]
+        if _lowered is None:
+            return _sloppy_equal(self._values[key][i], value)
+        _value = from_string(value)
+        if type(_value) == str:
+            _value = _value.lower()
+        else:
+            _lowered = self._values[key][i]
+            _value = repr(_value).lower()
+        return _value == _lowered or _value in _lowered or _lowered in _value
+
+    def sloppy_not_equal(self, key, i, value):
+        """Return True if value does not sloppy-match the record at position i ('~')"""
+        _lowered = self._lowered[key][i]
+        if _lowered is None:
+            return _sloppy_not_equal(self._values[key][i], value)
+        return not self.sloppy_equal(key, i, value)
+
+    def candidates(self, key, value):
+        """Return a set of positions of records that may sloppy-match value at key
+
+        Only string values can be ruled out; every returned position still
+        needs to be checked with sloppy_equal
+        """
+        _value = from_string(value)
+        if type(_value) == str:
+            _value = _value.lower()
+        else:
+            _value = repr(_value).lower()
+        if len(_value) < 3:
+            return set(range(len(self.some_dicts)))
+        postings = sorted(
+            [self._trigrams[key].get(trigram, set()) for trigram in _get_trigrams(_value)],
+            key=len
+        )
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result &= posting
+
+        # The record value can also be contained in the search value
+        lengths = self._lengths[key]
+        result.update([i for _, i in lengths[:bisect_right(lengths, (len(_value), len(self.some_dicts)))]])
+        result.update(self._non_strings[key])
+        return result
+
+
+def _get_find_term_dict(terms):
+    """Return a dict of key names and lists of (operator, value) tuples
+
+    - terms: string of 'key:value' pairs separated by any of , ; | (see
+      find_items)
     """
     terms = string_to_set(terms)
     term_dict = defaultdict(list)
@@ -718,39 +3101,302 @@ def find_items(some_dicts, terms):
             operator = '=='
             value = from_string(value)
         term_dict[key].append((operator, value))
+    return term_dict
 
-    for some_dict in some_dicts:
+
+def _get_find_matcher(terms):
+    """Return a func that returns True if a dict satisfies the find terms
+
+    - terms: string of 'key:value' pairs separated by any of , ; | (see
+      find_items)
+    """
+    getters = [
+        (compile_key_path(key), op_vals)
+        for key, op_vals in _get_find_term_dict(terms).items()
+    ]
+
+    def is_match(some_dict):
+        for get_value, op_vals in getters:
+            v = from_string(get_value(some_dict))
+            if not any([FIND_OPERATORS[operator](v, value) for operator, value in op_vals]):
+                return False
+        return True
+
+    return is_match
+
+
+def find_items(some_dicts, terms, index=None):
+    """Return a generator containing dicts where specified terms are satisfied
+
+    - some_dicts: a list of dict objects
+    - terms: string of 'key:value' pairs separated by any of , ; |
+        - after the ':' any of the operators defined in FIND_OPERATORS may be
+          used before the value (i.e. 'rate:>5')
+        - no operator implies the '==' operator
+    - index: a TrigramIndex built from some_dicts
+        - terms on indexed keys use the values cached in the index, and records
+          that cannot satisfy '$' terms on indexed keys are skipped
+    """
+    if index is None:
+        is_match = _get_find_matcher(terms)
+        for some_dict in some_dicts:
+            if is_match(some_dict):
+                yield(some_dict)
+        return
+
+    term_dict = _get_find_term_dict(terms)
+    records = enumerate(some_dicts)
+    positions = None
+    for key, op_vals in term_dict.items():
+        if key in index and all([operator == '$' for operator, _ in op_vals]):
+            _positions = set()
+            for _, value in op_vals:
+                _positions.update(index.candidates(key, value))
+            if positions is None:
+                positions = _positions
+            else:
+                positions &= _positions
+    if positions is not None:
+        records = ((i, some_dicts[i]) for i in sorted(positions))
+
+    getters = {key: compile_key_path(key) for key in term_dict}
+    for i, some_dict in records:
         matches = defaultdict(list)
         for key, op_vals in term_dict.items():
+            indexed = key in index
+            if indexed:
+                v = index.value(key, i)
+            else:
+                v = from_string(getters[key](some_dict))
             for operator, value in op_vals:
-                v = from_string(get_value_at_key(some_dict, key))
-                matches[key].append(
-                    FIND_OPERATORS[operator](v, value)
-                )
+                if indexed and operator == '$':
+                    matches[key].append(index.sloppy_equal(key, i, value))
+                elif indexed and operator == '~':
+                    matches[key].append(index.sloppy_not_equal(key, i, value))
+                else:
+                    matches[key].append(
+                        FIND_OPERATORS[operator](v, value)
+                    )
         if all([any(v) for v in matches.values()]):
             yield(some_dict)
 
 
 def chunk_list(some_list, n):
-    """Return a generator with n-sized chunks of items in some_list"""
+    """Return a generator with n-sized chunks of items in some_list
+
+    - some_list: a list (or other sliceable sequence), bytes/bytearray, or any
+      other iterable (like a generator from find_items or yield_objs_from_json)
+    - n: max number of items in each chunk
+
+    Chunks of bytes, bytearray, and memoryview objects are memoryview slices
+    of the same memory (nothing copied). Chunks of iterables that can't be
+    sliced are lists, and only one chunk is pulled from the iterable at a time
+    """
+    if n < 1:
+        raise ValueError('n must be at least 1, not {}'.format(n))
+    if isinstance(some_list, (bytes, bytearray, memoryview)):
+        some_list = memoryview(some_list)
+    elif (
+        not hasattr(some_list, '__getitem__') or
+        not hasattr(some_list, '__len__') or
+        isinstance(some_list, Mapping)
+    ):
+        items = iter(some_list)
+        chunk = list(islice(items, n))
+        while chunk:
+            yield chunk
+            chunk = list(islice(items, n))
+        return
     for i in range(0, len(some_list), n):
         yield some_list[i:i + n]
 
 
-def unique_counted_items(items):
+def parallel_map_chunks(func, iterable, n, workers=None, use_threads=False,
+                        max_in_flight=None, ordered=True):
+    """Return a generator of func results for each n-sized chunk of iterable
+
+    - func: a single-variable func that accepts a chunk (must be picklable
+      unless use_threads)
+    - iterable: anything chunk_list accepts
+    - n: max number of items in each chunk
+    - workers: number of processes (or threads) in the pool (default is the
+      number of CPUs)
+    - use_threads: if True, use a thread pool instead of a process pool
+    - max_in_flight: max number of chunks submitted to the pool and not yet
+      yielded (default is 2 * workers)
+    - ordered: if False, yield results as they finish instead of in the same
+      order as the chunks
+
+    Results are yielded in the same order as the chunks, and chunks are only
+    pulled from iterable as results are yielded. Memoryview chunks are sent to
+    a process pool as bytes
+    """
+    chunks = chunk_list(iterable, n)
+    if not use_threads:
+        chunks = (
+            chunk.tobytes() if type(chunk) == memoryview else chunk
+            for chunk in chunks
+        )
+    return _map_in_pool(
+        func, chunks, workers=workers, use_threads=use_threads,
+        max_in_flight=max_in_flight, ordered=ordered
+    )
+
+
+def unique_counted_items(items, limit=None):
     """Return list of unique items, prefixed by count, sorted by count
 
     - items: list of hashable items (not dicts)
+    - limit: if specified, only return this many of the most common items
+        - when limit is less than a tenth of the number of unique items,
+          heapq.nlargest is used instead of sorting every unique item
     """
-    return [
+    counts = Counter(items)
+    if limit is not None and limit * 10 < len(counts):
+        size = limit
+        while True:
+            top = nlargest(size, counts.items(), key=itemgetter(1))
+            results = [(count, item) for item, count in top if item]
+            if len(results) >= limit or len(top) < size:
+                return results[:limit]
+            # Falsy items took some of the places, so get more
+            size += limit - len(results)
+    results = [
         (count, item)
         for item, count in sorted(
-            Counter(items).items(),
+            counts.items(),
             key=lambda x: x[1],
             reverse=True
         )
         if item
     ]
+    if limit is not None:
+        return results[:limit]
+    return results
+
+
+def top_counted_items(items, limit=10, capacity=None):
+    """Return list of the most common items, prefixed by approximate count
+
+    - items: iterable of hashable items (not dicts), like a generator over an
+      unbounded stream
+    - limit: max number of items to return
+    - capacity: max number of unique items counted at once (default is 10
+      times the limit), see SpaceSavingCounter
+
+    Falsy items are skipped, same as unique_counted_items. Memory only depends
+    on capacity, not on how many unique items there are
+    """
+    counter = SpaceSavingCounter(capacity or limit * 10)
+    counter.update(filter(None, items))
+    return counter.most_common(limit)
+
+
+class SpaceSavingCounter(object):
+    """Approximate counts for the most common items in a stream, in bounded memory
+
+    - capacity: max number of unique items to keep counts for
+
+    Uses the Space-Saving algorithm: once all counters are taken, a new item
+    replaces the item with the lowest count and starts from that count. Counts
+    are never lower than the true counts, and never more than `error` higher
+    (at most total / capacity). Any item seen more than total / capacity times
+    is always kept
+    """
+    def __init__(self, capacity=1000):
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1, not {}'.format(capacity))
+        self.capacity = capacity
+        self.total = 0
+        self._counts = {}
+        self._heap = None
+        self._seq = 0
+
+    def add(self, item, count=1):
+        """Count item (count times)"""
+        self.total += count
+        entry = self._counts.get(item)
+        if entry is None:
+            self._add_new(item, count)
+        else:
+            entry[0] += count
+
+    def update(self, items):
+        """Count every item in an iterable"""
+        counts = self._counts
+        total = 0
+        for item in items:
+            total += 1
+            entry = counts.get(item)
+            if entry is None:
+                self._add_new(item, 1)
+            else:
+                entry[0] += 1
+        self.total += total
+
+    def _add_new(self, item, count):
+        """Start counting an item, replacing the item with the lowest count if full
+
+        The heap is only built once all counters are taken. Entries are not
+        updated when counts go up, so a popped entry with an old count is
+        pushed back with the current count until the lowest one is found
+        """
+        counts = self._counts
+        if len(counts) < self.capacity:
+            counts[item] = [count, 0]
+            return
+        heap = self._heap
+        if heap is None:
+            heap = self._heap = [
+                (entry[0], i, _item)
+                for i, (_item, entry) in enumerate(counts.items())
+            ]
+            heapify(heap)
+            self._seq = len(heap)
+        while True:
+            min_count, seq, min_item = heappop(heap)
+            current = counts[min_item][0]
+            if current == min_count:
+                break
+            heappush(heap, (current, seq, min_item))
+        del counts[min_item]
+        counts[item] = [min_count + count, min_count]
+        self._seq += 1
+        heappush(heap, (min_count + count, self._seq, item))
+
+    @property
+    def error(self):
+        """Most that any count can be higher than the true count"""
+        if self._heap is None:
+            return 0
+        return min([entry[0] for entry in self._counts.values()])
+
+    def bounds(self, item):
+        """Return a tuple of the lowest and highest possible true count for item"""
+        entry = self._counts.get(item)
+        if entry is None:
+            return (0, self.error)
+        return (entry[0] - entry[1], entry[0])
+
+    def most_common(self, limit=None):
+        """Return list of counted items, prefixed by count, sorted by count
+
+        - limit: if specified, only return this many of the most common items
+        """
+        items = [(item, entry[0]) for item, entry in self._counts.items()]
+        if limit is not None:
+            items = nlargest(limit, items, key=itemgetter(1))
+        else:
+            items.sort(key=itemgetter(1), reverse=True)
+        return [(count, item) for item, count in items]
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __repr__(self):
+        return '<{} capacity={} total={} error={}>'.format(
+            self.__class__.__name__, self.capacity, self.total, self.error
+        )
 
 
 def get_string_maker(item_format='', missing_key_default=''):
@@ -806,6 +3452,228 @@ def get_string_maker(item_format='', missing_key_default=''):
     return lambda x: x
 
 
+def _map_in_pool(func, items, workers=None, use_threads=False, max_in_flight=None,
+                 ordered=True):
+    """Return a generator of func results for each item, computed in a pool
+
+    - func: a single-variable func (must be picklable unless use_threads)
+    - items: an iterable of items to pass to func
+    - workers: number of processes (or threads) in the pool (default is the
+      number of CPUs)
+    - use_threads: if True, use a thread pool instead of a process pool
+    - max_in_flight: max number of items submitted to the pool and not yet
+      yielded (default is 2 * workers)
+    - ordered: if False, yield results as they finish instead of in the same
+      order as items
+
+    Results are yielded in the same order as items (unless ordered is False)
+    """
+    if not workers:
+        workers = cpu_count() or 1
+    if not max_in_flight:
+        max_in_flight = 2 * workers
+    executor_class = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        if not ordered:
+            pending = set()
+            for item in items:
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(executor.submit(func, item))
+            for future in as_completed(pending):
+                yield future.result()
+            return
+        futures = deque()
+        for item in items:
+            if len(futures) >= max_in_flight:
+                yield futures.popleft().result()
+            futures.append(executor.submit(func, item))
+        while futures:
+            yield futures.popleft().result()
+
+
+_DROPPED = object()
+
+
+class Pipeline(object):
+    """Build a single per-record func from a chain of dict transformation stages
+
+    - copy: how values are copied by the first stage that builds a new dict
+      ('deep', 'shallow', or 'none')
+
+    Each stage method returns the pipeline, so stages can be chained
+
+    >>> pipeline = Pipeline().find('status:running').filter_keys('name, thing.a')
+    >>> results = list(pipeline(some_dicts))
+
+    The stages are compiled into one func that is applied to each record once.
+    Only the first stage that copies values does so (filter_keys makes a new
+    dict but never copies, so the stage after it still copies), and later
+    stages update that dict instead of making their own intermediate dicts
+    """
+    DROPPED = _DROPPED
+
+    def __init__(self, copy='deep'):
+        _get_copy_func(copy)
+        self.copy = copy
+        self.stages = []
+        self._func = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_func'] = None
+        return state
+
+    def __repr__(self):
+        return '{}({})'.format(
+            self.__class__.__name__,
+            ', '.join([name for name, _, _ in self.stages])
+        )
+
+    def _add_stage(self, name, args=(), kwargs=None):
+        self.stages.append((name, args, kwargs or {}))
+        self._func = None
+        return self
+
+    def find(self, terms):
+        """Add a stage that drops records where the terms are not satisfied (see find_items)"""
+        return self._add_stage('find', (terms,))
+
+    def filter_keys(self, *keys, **conditions):
+        """Add a filter_keys stage"""
+        return self._add_stage('filter_keys', keys, conditions)
+
+    def ignore_keys(self, *keys):
+        """Add an ignore_keys stage"""
+        return self._add_stage('ignore_keys', keys)
+
+    def flatten_and_ignore_keys(self, *keys, lists=False):
+        """Add a flatten_and_ignore_keys stage"""
+        return self._add_stage('flatten_and_ignore_keys', keys, {'lists': lists})
+
+    def rename_keys(self, **mapping):
+        """Add a rename_keys stage"""
+        return self._add_stage('rename_keys', kwargs=mapping)
+
+    def cast_keys(self, **casting):
+        """Add a cast_keys stage"""
+        return self._add_stage('cast_keys', kwargs=casting)
+
+    def string_maker(self, item_format='', missing_key_default=''):
+        """Add a stage that makes a string from each record (see get_string_maker)"""
+        return self._add_stage('string_maker', (item_format, missing_key_default))
+
+    def map(self, func):
+        """Add a stage that passes each record to a single-variable func
+
+        - func: returns the new record (or any other object)
+        """
+        return self._add_stage('map', (func,))
+
+    def compile(self):
+        """Return the func that applies every stage to a single record
+
+        The func returns the transformed record, or Pipeline.DROPPED if the
+        record was dropped by a find stage (so a stage can return None as the
+        new record)
+        """
+        if self._func is None:
+            funcs = self._get_stage_funcs()
+
+            def process(record):
+                for func in funcs:
+                    record = func(record)
+                    if record is _DROPPED:
+                        break
+                return record
+
+            self._func = process
+        return self._func
+
+    def _get_stage_funcs(self):
+        funcs = []
+        # owned: the record is a dict made by an earlier stage (so it can be
+        # changed in place), copied: its values were already copied with the
+        # copy mode (filter_keys makes a new dict but never copies values)
+        owned = False
+        copied = self.copy == 'none'
+        for name, args, kwargs in self.stages:
+            copy = 'none' if copied else self.copy
+            inplace = owned and copied
+            if name == 'find':
+                is_match = _get_find_matcher(*args)
+                func = lambda record, is_match=is_match: record if is_match(record) else _DROPPED
+            elif name == 'filter_keys':
+                func = _get_filter_keys_func(args, kwargs)
+                owned = True
+            elif name == 'ignore_keys':
+                func = _get_ignore_keys_func(args, copy=copy, inplace=inplace)
+                owned = copied = True
+            elif name == 'flatten_and_ignore_keys':
+                func = _get_flatten_func(args, copy=copy, **kwargs)
+                owned = copied = True
+            elif name == 'rename_keys':
+                func = partial(rename_keys, _copy=copy, **kwargs)
+                owned = copied = True
+            elif name == 'cast_keys':
+                if inplace:
+                    func = partial(cast_keys, _inplace=True, **kwargs)
+                else:
+                    func = partial(cast_keys, _copy=copy, **kwargs)
+                owned = copied = True
+            elif name == 'string_maker':
+                func = get_string_maker(*args)
+                owned = False
+                copied = self.copy == 'none'
+            elif name == 'map':
+                func = args[0]
+                owned = False
+                copied = self.copy == 'none'
+            funcs.append(func)
+        return funcs
+
+    def __call__(self, some_dicts):
+        """Return a generator of transformed records (dropped records are skipped)
+
+        - some_dicts: an iterable of dict objects (i.e. from yield_objs_from_json)
+        """
+        process = self.compile()
+        for record in some_dicts:
+            record = process(record)
+            if record is not _DROPPED:
+                yield record
+
+    def _process_batch(self, some_dicts):
+        process = self.compile()
+        return [record for record in map(process, some_dicts) if record is not _DROPPED]
+
+    def run(self, some_dicts, workers=None, batch_size=1000, use_threads=False):
+        """Return a generator of transformed records, optionally using a pool
+
+        - some_dicts: an iterable of dict objects (i.e. from yield_objs_from_json)
+        - workers: if specified, process batches of records in a pool of this
+          many processes
+            - stage arguments (like conditions or map funcs) must be picklable
+              unless use_threads is True
+        - batch_size: number of records sent to a worker at a time
+        - use_threads: if True, use a thread pool instead of a process pool
+
+        Records are yielded in the same order as some_dicts
+        """
+        if not workers:
+            return self(some_dicts)
+        return (
+            record
+            for batch in parallel_map_chunks(
+                self._process_batch, some_dicts, batch_size, workers=workers,
+                use_threads=use_threads
+            )
+            for record in batch
+        )
+
+
 def timestamp_to_seconds(timestamp):
     """Return number of seconds (int) for given timestamp
 
@@ -1,3 +1,8 @@
+import io
+import json
+import mmap
+import os
+from collections import OrderedDict
 import pytest
 import input_helper as ih
 
@@ -232,6 +237,56 @@ class Test__from_string(object):
         assert value == ['dog', '01', '2', '3.10', '4.0', None, True]
 
 
+class Test__from_strings(object):
+    def test_same_as_from_string(self):
+        values = ['0', '00', '01', '10', '-5', '1.0', '0.50', 'none', 'TRUE', 'dog',
+                  '12345678901234567890', 5, None, '']
+        result = ih.from_strings(values)
+        assert result == [ih.from_string(v) for v in values]
+        assert [type(v) for v in result] == [type(ih.from_string(v)) for v in values]
+
+    def test_keep_num_as_string(self):
+        assert ih.from_strings(['10', '1.5', 'true'], keep_num_as_string=True) == ['10', '1.5', True]
+
+    def test_cached(self):
+        ih._from_string.cache_clear()
+        ih.from_string('localhost')
+        ih.from_string('localhost')
+        assert ih._from_string.cache_info().hits == 1
+
+    def test_numbers_not_cached(self):
+        ih._from_string.cache_clear()
+        assert ih.from_strings(['6379', '-4.5', '1e3', '007', '0.5']) == [6379, -4.5, 1000, '007', 0.5]
+        assert ih.from_string('6379') == 6379
+        assert ih._from_string.cache_info().currsize == 0
+
+
+class Test__infer_and_convert(object):
+    def test_infer_string_type(self):
+        assert ih.infer_string_type(['1', '2', 'none', None]) == 'int'
+        assert ih.infer_string_type(['1', '2.5']) == 'float'
+        assert ih.infer_string_type(['true', 'False']) == 'bool'
+        assert ih.infer_string_type(['None', None]) == 'none'
+        assert ih.infer_string_type(['01', '02']) == 'str'
+        assert ih.infer_string_type(['a', '1']) == 'str'
+        assert ih.infer_string_type(['1', 'x', 'y'], sample_size=1) == 'int'
+
+    def test_same_as_from_string(self):
+        columns = {
+            'a': ['1', '-5', '-05', '007', '12345678901234567890', 'none', 'dog'],
+            'b': ['1.5', '0.50', '00.5', '1e3', '10', 'nan', 'true', ''],
+            'c': ['true', 'FALSE', 'none', '5', 'nope'],
+            'd': ['cat', 'dog', 'nan', 'Infinity', 'None', '3', ' x'],
+        }
+        result = ih.infer_and_convert(columns, sample_size=3)
+        for name, vals in columns.items():
+            expected = [ih.from_string(v) for v in vals]
+            assert repr(result[name]) == repr(expected)
+
+    def test_list_of_columns(self):
+        assert ih.infer_and_convert([['1', '2'], ['a', 'true']]) == [[1, 2], ['a', True]]
+
+
 class Test__get_list_from_arg_strings(object):
     def test_single_arg1(self):
         result = ih.get_list_from_arg_strings('dog')
@@ -1086,3 +1141,951 @@ class TestTimestamps(object):
             'hms': '3h25m46s',
             'pretty': '3 hours, 25 minutes, 45.679 seconds'
         }
+
+
+class Test__TrigramIndex(object):
+    def test_candidates_narrowed(self, some_dicts):
+        index = ih.TrigramIndex(some_dicts, 'status')
+        assert index.candidates('status', 'runni') == {0, 1, 3, 5}
+        assert index.candidates('status', 'xyz') == {5}
+
+    def test_candidates_include_shorter_and_non_strings(self):
+        some_dicts = [{'a': 'cat'}, {'a': 'concatenate'}, {'a': 5}, {'a': 'dog'}, {}]
+        index = ih.TrigramIndex(some_dicts, 'a')
+        assert index.candidates('a', 'CATS') == {0, 2, 3, 4}
+        assert [i for i in index.candidates('a', 'CATS') if index.sloppy_equal('a', i, 'CATS')] == [0]
+
+    def test_find_items_same_results(self, some_dicts, some_dicts2):
+        index = ih.TrigramIndex(some_dicts, 'status, thing.a')
+        for terms in ('status:$run', 'status:~run', 'status:$unknown or running',
+                      'thing.a:$1, status:$nn', 'status:$none', 'name:$th, status:$un'):
+            expected = list(ih.find_items(some_dicts, terms))
+            assert list(ih.find_items(some_dicts, terms, index=index)) == expected
+        index2 = ih.TrigramIndex(some_dicts2, 'id')
+        for terms in ('id:$123', 'id:$-', 'id:~ABC', 'id:$klm-7890'):
+            expected = list(ih.find_items(some_dicts2, terms))
+            assert list(ih.find_items(some_dicts2, terms, index=index2)) == expected
+
+
+class Test__sort_by_keys(object):
+    def test_simple(self, some_dicts2):
+        ih.sort_by_keys(some_dicts2, 'name')
+        assert [d['name'] for d in some_dicts2] == ['first', 'fourth', 'second', 'third']
+
+    def test_nested_and_descending(self, some_dicts):
+        ih.sort_by_keys(some_dicts, 'thing.a, thing.b', desc='thing.a')
+        assert [d['name'] for d in some_dicts] == [
+            'sixth', 'fourth', 'second', 'fifth', 'first', 'third'
+        ]
+
+    def test_key_starting_with_dash(self):
+        some_dicts = [{'-x': 2, 'x': 1}, {'-x': 1, 'x': 2}, {'-x': 3, 'x': 3}]
+        ih.sort_by_keys(some_dicts, '-x')
+        assert [d['-x'] for d in some_dicts] == [1, 2, 3]
+        ih.sort_by_keys(some_dicts, '-x', desc='-x')
+        assert [d['-x'] for d in some_dicts] == [3, 2, 1]
+
+    def test_none_and_mixed_types(self, some_dicts):
+        some_dicts[0]['status'] = 5
+        ih.sort_by_keys(some_dicts, 'status')
+        assert [d['status'] for d in some_dicts] == [
+            None, 5, 'running', 'running', 'stopped', 'unknown'
+        ]
+
+    def test_convert(self):
+        some_dicts = [{'n': '10'}, {'n': '9'}, {'n': 'none'}, {'n': '2.5'}]
+        ih.sort_by_keys(some_dicts, 'n', convert=True)
+        assert [d['n'] for d in some_dicts] == ['none', '2.5', '9', '10']
+
+    def test_limit(self, some_dicts):
+        expected = sorted(some_dicts, key=lambda d: (d['thing']['b'], d['name']), reverse=True)[:3]
+        result = ih.sort_by_keys(iter(some_dicts), 'thing.b, name', reverse=True, limit=3)
+        assert result == expected
+        assert [d['name'] for d in some_dicts][:2] == ['first', 'second']
+
+
+class Test__yield_sorted_dicts(object):
+    def test_in_memory(self, some_dicts):
+        result = list(ih.yield_sorted_dicts(iter(some_dicts), 'name'))
+        ih.sort_by_keys(some_dicts, 'name')
+        assert result == some_dicts
+
+    def test_spilled_runs(self, some_dicts):
+        some_dicts = some_dicts * 5
+        result = list(ih.yield_sorted_dicts(
+            (d for d in some_dicts), 'thing.a, status', desc=['thing.a'], run_size=4
+        ))
+        ih.sort_by_keys(some_dicts, 'thing.a, status', desc=['thing.a'])
+        assert result == some_dicts
+
+    def test_spilled_runs_reverse(self, some_dicts):
+        some_dicts = some_dicts * 3
+        result = list(ih.yield_sorted_dicts(some_dicts, 'thing.b', reverse=True, run_size=6))
+        ih.sort_by_keys(some_dicts, 'thing.b', reverse=True)
+        assert result == some_dicts
+
+
+class Test__compile_key_path(object):
+    def test_cached(self):
+        assert ih.compile_key_path('Mice.c') is ih.compile_key_path('Mice.c')
+
+    def test_same_as_get_value_at_key(self, some_dict):
+        for key in ('Thing', 'Dogs', 'Birds', 'Birds.Value', 'Mice.a', 'Mice.c', 'Mice.x', 'Nope.x'):
+            assert ih.compile_key_path(key)(some_dict) == ih.get_value_at_key(some_dict, key)
+        get_value = ih.compile_key_path('Birds.Value')
+        assert get_value(some_dict, lambda x: x['Key'] == 'Name') == ['Some bird', 'Another bird']
+        assert ih.compile_key_path('Cats')(some_dict, lambda x: x > 10) == [12, 19, 22]
+
+    def test_extract_many(self, some_dicts):
+        result = list(ih.extract_many(some_dicts[:3], 'name, thing.a', 'missing'))
+        assert result == [('first', 1, None), ('second', 10, None), ('third', 0, None)]
+
+
+class Test__flatten_and_ignore_keys(object):
+    def test_copy_modes(self, some_dict):
+        result = ih.flatten_and_ignore_keys(some_dict, 'Birds')
+        assert result['Mice.c'] == some_dict['Mice']['c']
+        assert result['Mice.c'] is not some_dict['Mice']['c']
+        result = ih.flatten_and_ignore_keys(some_dict, 'Birds', copy='shallow')
+        assert result['Mice.c'] is not some_dict['Mice']['c']
+        result = ih.flatten_and_ignore_keys(some_dict, 'Birds', copy='none')
+        assert result['Mice.c'] is some_dict['Mice']['c']
+        with pytest.raises(ValueError):
+            ih.flatten_and_ignore_keys(some_dict, copy='all')
+
+    def test_deeply_nested(self):
+        some_dict = {}
+        current = some_dict
+        for _ in range(3000):
+            current['x'] = {}
+            current = current['x']
+        current['y'] = 1
+        result = ih.flatten_and_ignore_keys(some_dict)
+        assert result == {'.'.join(['x'] * 3000 + ['y']): 1}
+
+    def test_multiple_patterns(self, some_dict2):
+        result = ih.flatten_and_ignore_keys(some_dict2, 'order.details.p*, user.[an]*', 'user_ok')
+        assert result == {
+            'order.id': 12345,
+            'order.details.quantity': 1,
+        }
+
+
+class Test__copy_modes_and_views(object):
+    def test_ignore_keys(self, some_dict):
+        result = ih.ignore_keys(some_dict, 'Birds, Cats', copy='none')
+        assert sorted(result) == ['Dogs', 'Mice', 'Thing']
+        assert result['Mice'] is some_dict['Mice']
+        assert ih.ignore_keys(some_dict, 'Birds, Cats')['Mice'] is not some_dict['Mice']
+        result = ih.ignore_keys(some_dict, 'Birds, Cats', inplace=True)
+        assert result is some_dict
+        assert sorted(some_dict) == ['Dogs', 'Mice', 'Thing']
+
+    def test_rename_keys(self):
+        some_dict = {'a': [1], 'b': [2], 'c': 3}
+        expected = ih.rename_keys(some_dict, a='b', b='a')
+        assert expected == {'b': [1], 'a': [2], 'c': 3}
+        assert ih.rename_keys(some_dict, _copy='shallow', a='b')['b'] is not some_dict['a']
+        result = ih.rename_keys(some_dict, _inplace=True, a='b', b='a')
+        assert result is some_dict
+        assert some_dict == expected
+        options = {'copy': 1, 'inplace': 2}
+        assert ih.rename_keys(options, copy='c', inplace='i') == {'c': 1, 'i': 2}
+        assert list(ih.Pipeline().rename_keys(copy='c')([options])) == [{'c': 1, 'inplace': 2}]
+
+    def test_cast_keys(self):
+        some_dict = {'a': '1', 'b': 'x', 'c': [3]}
+        result = ih.cast_keys(some_dict, _copy='none', a=int, b=int)
+        assert result == {'a': 1, 'b': 'x', 'c': [3]}
+        assert result['c'] is some_dict['c']
+        assert ih.cast_keys(some_dict, _inplace=True, a=int, b=int) is some_dict
+        assert some_dict == {'a': 1, 'b': 'x', 'c': [3]}
+        assert ih.cast_keys({'copy': '1', 'inplace': '2'}, copy=int, inplace=int) == {'copy': 1, 'inplace': 2}
+
+    def test_ignore_keys_view(self, some_dict):
+        view = ih.IgnoreKeysView(some_dict, 'Birds, Cats, Nope')
+        assert view == ih.ignore_keys(some_dict, 'Birds, Cats, Nope')
+        assert len(view) == 3
+        assert 'Birds' not in view
+        assert view['Mice'] is some_dict['Mice']
+        with pytest.raises(KeyError):
+            view['Cats']
+
+    def test_rename_keys_view(self):
+        some_dict = {'a': 1, 'b': 2, 'c': 3}
+        for mapping in ({'a': 'x'}, {'a': 'b', 'b': 'a'}, {'a': 'b'}, {'c': 'a'}):
+            view = ih.RenameKeysView(some_dict, **mapping)
+            assert dict(view) == ih.rename_keys(some_dict, **mapping)
+            assert len(view) == len(ih.rename_keys(some_dict, **mapping))
+
+    def test_cast_keys_view(self):
+        some_dict = {'a': '1', 'b': 'x'}
+        view = ih.CastKeysView(some_dict, a=int, b=int)
+        assert dict(view) == {'a': 1, 'b': 'x'}
+        assert some_dict == {'a': '1', 'b': 'x'}
+
+
+class Test__Pipeline(object):
+    def test_same_as_chained_calls(self, some_dicts):
+        pipeline = ih.Pipeline().find('status:running').filter_keys(
+            'name, thing.a, thing.b'
+        ).rename_keys(thing__a='a').cast_keys(a=str).ignore_keys('thing__b')
+        expected = [
+            ih.ignore_keys(
+                ih.cast_keys(
+                    ih.rename_keys(ih.filter_keys(d, 'name, thing.a, thing.b'), thing__a='a'),
+                    a=str
+                ),
+                'thing__b'
+            )
+            for d in ih.find_items(some_dicts, 'status:running')
+        ]
+        assert list(pipeline(some_dicts)) == expected
+        assert list(pipeline(iter(some_dicts))) == expected
+
+    def test_input_not_modified(self, some_dicts):
+        pipeline = ih.Pipeline(copy='none').cast_keys(name=str.upper).ignore_keys('status')
+        results = list(pipeline(some_dicts))
+        assert results[0] == {'name': 'FIRST', 'thing': {'a': 1, 'b': 2}}
+        assert results[0]['thing'] is some_dicts[0]['thing']
+        assert some_dicts[0]['name'] == 'first'
+        assert 'status' in some_dicts[0]
+
+    def test_deep_copy_after_filter_keys(self, some_dicts):
+        pipeline = ih.Pipeline().filter_keys('name, thing').rename_keys(name='n')
+        results = list(pipeline(some_dicts))
+        assert results[0] == {'n': 'first', 'thing': {'a': 1, 'b': 2}}
+        assert results[0]['thing'] is not some_dicts[0]['thing']
+        pipeline = ih.Pipeline().filter_keys('name, thing').cast_keys(name=str.upper)
+        results = list(pipeline(some_dicts))
+        assert results[0] == {'name': 'FIRST', 'thing': {'a': 1, 'b': 2}}
+        assert results[0]['thing'] is not some_dicts[0]['thing']
+        results[0]['thing']['a'] = 100
+        assert some_dicts[0]['thing']['a'] == 1
+
+    def test_flatten_and_string_maker(self, some_dicts):
+        pipeline = ih.Pipeline().find('thing.a:>5').flatten_and_ignore_keys(
+            'thing.a'
+        ).map(lambda d: (d['name'], d['thing.b'])).string_maker('{} {}')
+        assert list(pipeline(some_dicts)) == ['second 5', 'fourth 2', 'fifth 20', 'sixth 21']
+
+    def test_none_records_kept(self, some_dicts):
+        pipeline = ih.Pipeline().find('status:running').map(lambda d: d.get('missing'))
+        expected = [None] * len(list(ih.find_items(some_dicts, 'status:running')))
+        assert list(pipeline(some_dicts)) == expected
+        assert list(pipeline.run(some_dicts, workers=2, batch_size=2, use_threads=True)) == expected
+        process = pipeline.compile()
+        assert process({'status': 'stopped'}) is ih.Pipeline.DROPPED
+        assert process({'status': 'running'}) is None
+
+    def test_run_in_pool(self, some_dicts):
+        pipeline = ih.Pipeline().find('status:$n').filter_keys('name, thing.b')
+        expected = list(pipeline(some_dicts * 10))
+        assert list(pipeline.run(some_dicts * 10, workers=2, batch_size=7)) == expected
+        assert list(pipeline.run(some_dicts * 10, workers=2, batch_size=4, use_threads=True)) == expected
+
+
+class Test__filter_keys_compiled(object):
+    def test_same_as_get_value_at_key(self, some_dict, some_dict2):
+        keys = ['Birds.Key', 'Birds.Value', 'Mice.a', 'Mice.c', 'Mice.z', 'Thing', 'Nope.x.y']
+        assert ih.filter_keys(some_dict, *keys) == {
+            key.replace('.', '__'): ih.get_value_at_key(some_dict, key)
+            for key in keys
+        }
+        keys = ['order.details.price', 'order.details.productID', 'order.id',
+                'user.address.city', 'user.address.zipcode', 'user.name', 'user_ok']
+        assert ih.filter_keys(some_dict2, *keys) == {
+            key.replace('.', '__'): ih.get_value_at_key(some_dict2, key)
+            for key in keys
+        }
+
+    def test_with_conditions(self, some_dict):
+        result = ih.filter_keys(
+            some_dict, 'Birds.Value, Birds.Key, Mice.c',
+            Birds__Value=lambda x: x['Key'] == 'Name'
+        )
+        assert result == {
+            'Birds__Value': ['Some bird', 'Another bird'],
+            'Birds__Key': ['Name', 'Misc', 'Other', 'Name'],
+            'Mice__c': [1, 2, 3],
+        }
+
+    def test_key_order(self, some_dict2):
+        keys = ['user.name', 'order.id', 'user_ok', 'user.address.city']
+        assert list(ih.filter_keys(some_dict2, *keys)) == [k.replace('.', '__') for k in keys]
+
+    def test_cached(self, some_dict2):
+        ih._get_cached_filter_keys_func.cache_clear()
+        ih.filter_keys(some_dict2, 'user.name, order.id')
+        ih.filter_keys(some_dict2, 'user.name, order.id')
+        assert ih._get_cached_filter_keys_func.cache_info().hits == 1
+        assert ih.filter_keys(some_dict2, ['user.name'], 'order.id') == ih.filter_keys(some_dict2, 'user.name, order.id')
+
+
+class Test__iter_flat_items(object):
+    def test_same_as_flatten(self, some_dict, some_dict2):
+        assert dict(ih.iter_flat_items(some_dict2)) == ih.flatten_and_ignore_keys(some_dict2)
+        assert dict(ih.iter_flat_items(some_dict, 'Birds, Mice.c')) == ih.flatten_and_ignore_keys(
+            some_dict, 'Birds, Mice.c'
+        )
+
+    def test_lazy(self, some_dict2):
+        items = ih.iter_flat_items(some_dict2)
+        assert next(items) == ('order.id', 12345)
+
+    def test_unflatten(self, some_dict2):
+        assert ih.unflatten_keys(dict(ih.iter_flat_items(some_dict2))) == some_dict2
+
+    def test_lists(self, some_dict):
+        result = dict(ih.iter_flat_items(some_dict, 'Cats, Birds.[12]*', lists=True))
+        assert result == {
+            'Thing': -5,
+            'Dogs.0': 10,
+            'Dogs.1': 3,
+            'Birds.0.Key': 'Name',
+            'Birds.0.Value': 'Some bird',
+            'Birds.3.Key': 'Name',
+            'Birds.3.Value': 'Another bird',
+            'Mice.a': 5,
+            'Mice.b': -10,
+            'Mice.c.0': 1,
+            'Mice.c.1': 2,
+            'Mice.c.2': 3,
+        }
+        assert ih.flatten_and_ignore_keys(some_dict, 'Cats, Birds.[12]*', lists=True) == result
+
+    def test_lists_empty_values(self):
+        some_dict = {'a': [], 'b': {}, 'c': [{}]}
+        assert list(ih.iter_flat_items(some_dict)) == [('a', []), ('c', [{}])]
+        assert list(ih.iter_flat_items(some_dict, lists=True)) == [('a', []), ('b', {}), ('c.0', {})]
+
+
+class Test__unflatten_many(object):
+    def test_same_as_unflatten_keys(self, some_dict2):
+        flat = ih.flatten_and_ignore_keys(some_dict2)
+        assert list(ih.unflatten_many([flat, flat], lists=False)) == [some_dict2, some_dict2]
+
+    def test_round_trip_with_lists(self, some_dict):
+        flat_dicts = [dict(ih.iter_flat_items(some_dict, lists=True))] * 3
+        assert list(ih.unflatten_many(flat_dicts, lists=True)) == [some_dict] * 3
+
+    def test_round_trip_empty_values(self):
+        some_dict = {'a': [1, {'b': [], 'c': {}, 'd': [[1, 2], [3]]}], 'e': {'f': [{'g': None}]}}
+        flat = dict(ih.iter_flat_items(some_dict, lists=True))
+        assert ih.unflatten_keys(flat, lists=True) == some_dict
+
+    def test_list_indexes(self):
+        flat = {'a.0': 1, 'a.2': 3, 'b.01': 4, 'c.0.x': 1, 'c.1.x': 2, 'd.0': 5, 'd.x': 6}
+        assert ih.unflatten_keys(flat, lists=True) == {
+            'a': {'0': 1, '2': 3},
+            'b': {'01': 4},
+            'c': [{'x': 1}, {'x': 2}],
+            'd': {'0': 5, 'x': 6},
+        }
+        assert ih.unflatten_keys(flat)['a'] == {'0': 1, '2': 3}
+        assert ih.unflatten_keys({'a.1': 2, 'a.0': 1}, lists=True) == {'a': [1, 2]}
+
+    def test_digit_dict_keys(self):
+        some_dict = {'counts': {'2020': 5, '2021': 7}, 'ids': [10, 20]}
+        flat = dict(ih.iter_flat_items(some_dict, lists=True))
+        assert list(ih.unflatten_many([flat])) == [{
+            'counts': {'2020': 5, '2021': 7},
+            'ids': {'0': 10, '1': 20},
+        }]
+        assert list(ih.unflatten_many([flat], lists=True)) == [some_dict]
+
+    def test_different_schemas(self):
+        flat_dicts = [{'a.b': 1}, {'a.0': 2}, {'a.b': 3}]
+        assert list(ih.unflatten_many(flat_dicts, lists=True)) == [{'a': {'b': 1}}, {'a': [2]}, {'a': {'b': 3}}]
+
+
+class Test__specialize(object):
+    def test_filter_keys(self, some_dicts):
+        func = ih.specialize(some_dicts[0], 'filter_keys', 'a, b, c.d', e=bool)
+        for some_dict in some_dicts:
+            assert func(some_dict) == ih.filter_keys(some_dict, 'a, b, c.d', e=bool)
+        assert func.fast_count + func.slow_count == len(some_dicts)
+
+    def test_filter_keys_nested(self, some_dict2):
+        keys = 'order.id, order.details.price, user.address.zipcode, user.name, user_ok'
+        func = ih.specialize(some_dict2, ih.filter_keys, keys)
+        assert func(some_dict2) == ih.filter_keys(some_dict2, keys)
+        other = {'order': {'id': 1}, 'user': 'someone'}
+        assert func(other) == ih.filter_keys(other, keys)
+        assert (func.fast_count, func.slow_count) == (1, 1)
+        assert 'get(' in func.source
+
+    def test_flatten_and_ignore_keys(self, some_dict, some_dict2):
+        func = ih.specialize(some_dict2, 'flatten_and_ignore_keys', '*.details.prod*', copy='none')
+        expected = ih.flatten_and_ignore_keys(some_dict2, '*.details.prod*', copy='none')
+        assert list(func(some_dict2).items()) == list(expected.items())
+        assert func(some_dict) == ih.flatten_and_ignore_keys(some_dict, '*.details.prod*')
+        assert (func.fast_count, func.slow_count) == (1, 1)
+
+    def test_flatten_and_ignore_keys_lists(self, some_dict):
+        func = ih.specialize(some_dict, 'flatten_and_ignore_keys', 'Cats', lists=True)
+        assert func(some_dict) == ih.flatten_and_ignore_keys(some_dict, 'Cats', lists=True)
+        some_dict['Dogs'].append(7)
+        assert func(some_dict) == ih.flatten_and_ignore_keys(some_dict, 'Cats', lists=True)
+        assert (func.fast_count, func.slow_count) == (1, 1)
+
+    def test_rename_keys(self, some_dict2):
+        func = ih.specialize(some_dict2, 'rename_keys', user='person', order='purchase')
+        result = func(some_dict2)
+        assert result == ih.rename_keys(some_dict2, user='person', order='purchase')
+        assert result['person'] is not some_dict2['user']
+        func = ih.specialize(some_dict2, 'rename_keys', _inplace=True, user='person')
+        assert func(some_dict2) is some_dict2
+        assert list(some_dict2) == ['order', 'person', 'user_ok']
+
+    def test_cached(self, some_dict2):
+        func = ih.specialize(some_dict2, 'rename_keys', user='person')
+        func2 = ih.specialize(dict(some_dict2), 'rename_keys', user='person')
+        assert func2._func is func._func
+        assert func2.fast_count == 0
+
+    def test_bad_operation(self, some_dict):
+        with pytest.raises(ValueError):
+            ih.specialize(some_dict, 'cast_keys')
+
+
+class Test__counted_items(object):
+    def test_unique_counted_items_limit(self):
+        items = ['a', 'b', '', 'a', 'c', None, 'b', 'a', '', '']
+        assert ih.unique_counted_items(items) == [(3, 'a'), (2, 'b'), (1, 'c')]
+        assert ih.unique_counted_items(items, limit=2) == [(3, 'a'), (2, 'b')]
+        assert ih.unique_counted_items(iter(items), limit=0) == []
+
+    def test_unique_counted_items_limit_heap(self):
+        items = [''] * 9 + [None] * 8 + ['a'] * 7 + [0] * 6 + ['b'] * 5 + ['x{}'.format(i) for i in range(100)]
+        expected = ih.unique_counted_items(items)
+        assert expected[:2] == [(7, 'a'), (5, 'b')]
+        for limit in (1, 2, 3, 5):
+            assert ih.unique_counted_items(items, limit=limit) == expected[:limit]
+
+    def test_top_counted_items_exact_when_capacity_fits(self):
+        items = ['a', 'b', '', 'a', 'c', None, 'b', 'a', '', '']
+        assert ih.top_counted_items(iter(items), 2) == [(3, 'a'), (2, 'b')]
+
+    def test_space_saving_bounds(self):
+        items = ['x'] * 50 + ['y'] * 30 + ['z{}'.format(i) for i in range(100)] + ['x'] * 20
+        counter = ih.SpaceSavingCounter(capacity=10)
+        counter.update(items)
+        assert len(counter) == 10
+        assert counter.total == len(items)
+        assert counter.error <= counter.total / 10
+        assert [item for count, item in counter.most_common(2)] == ['x', 'y']
+        low, high = counter.bounds('x')
+        assert low <= 70 <= high
+        low, high = counter.bounds('y')
+        assert low <= 30 <= high
+        assert counter.bounds('never-seen') == (0, counter.error)
+
+    def test_space_saving_add(self):
+        counter = ih.SpaceSavingCounter(capacity=2)
+        counter.add('a', 5)
+        counter.add('b')
+        counter.add('c')
+        assert counter.most_common() == [(5, 'a'), (2, 'c')]
+        assert counter.bounds('c') == (1, 2)
+        with pytest.raises(ValueError):
+            ih.SpaceSavingCounter(capacity=0)
+
+
+class Test__chunk_list(object):
+    def test_list(self):
+        assert list(ih.chunk_list([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
+
+    def test_generator(self, some_dicts):
+        found = ih.find_items(some_dicts, 'a:1')
+        chunks = list(ih.chunk_list(found, 2))
+        assert [len(chunk) for chunk in chunks][:-1] == [2] * (len(chunks) - 1)
+        assert [d for chunk in chunks for d in chunk] == list(ih.find_items(some_dicts, 'a:1'))
+        assert list(ih.chunk_list(iter([]), 3)) == []
+
+    def test_bytes(self):
+        data = bytearray(b'abcdefg')
+        chunks = list(ih.chunk_list(data, 3))
+        assert all([type(chunk) == memoryview for chunk in chunks])
+        assert [chunk.tobytes() for chunk in chunks] == [b'abc', b'def', b'g']
+        data[0:1] = b'z'
+        assert chunks[0].tobytes() == b'zbc'
+
+    def test_bad_size(self):
+        with pytest.raises(ValueError):
+            list(ih.chunk_list([1, 2], 0))
+
+
+class Test__parallel_map_chunks(object):
+    def test_threads_in_order(self):
+        results = ih.parallel_map_chunks(sum, (i for i in range(100)), 7, workers=4, use_threads=True)
+        assert list(results) == [sum(range(i, min(i + 7, 100))) for i in range(0, 100, 7)]
+
+    def test_processes_with_bytes(self):
+        results = ih.parallel_map_chunks(bytes.upper, b'abcdefgh', 3, workers=2)
+        assert list(results) == [b'ABC', b'DEF', b'GH']
+
+    def test_max_in_flight(self):
+        pulled = []
+
+        def numbers():
+            for i in range(100):
+                pulled.append(i)
+                yield i
+
+        results = ih.parallel_map_chunks(len, numbers(), 5, workers=1, use_threads=True, max_in_flight=2)
+        assert next(results) == 5
+        assert len(pulled) <= 3 * 5
+
+
+class Test__yield_objs_from_json_stream(object):
+    def test_file_path(self, tmpdir, some_dicts):
+        path = tmpdir.join('records.jsonl')
+        path.write('\n'.join([json.dumps(d) for d in some_dicts]) + '\n')
+        expected = list(ih.yield_objs_from_json(str(path)))
+        assert expected == some_dicts
+        for buffer_size in (1, 5, 64, 2 ** 16):
+            assert list(ih.yield_objs_from_json(
+                str(path), stream=True, buffer_size=buffer_size
+            )) == expected
+
+    def test_file_object_numbers_across_buffers(self):
+        text = '3.25e10 -12345 [1.5] "caf\u00e9" true 1e-7'
+        expected = list(ih.yield_objs_from_json(text))
+        for buffer_size in (1, 2, 3, 4):
+            assert list(ih.yield_objs_from_json(
+                io.StringIO(text), stream=True, buffer_size=buffer_size
+            )) == expected
+        assert list(ih.yield_objs_from_json(io.StringIO(text), stream=True, pos=8)) == expected[1:]
+
+    def test_error(self):
+        objs = ih.yield_objs_from_json(io.StringIO('{"a": 1} {bad'), stream=True, buffer_size=3)
+        assert next(objs) == {'a': 1}
+        with pytest.raises(ValueError):
+            next(objs)
+
+    def test_error_position(self):
+        text = '{"a": 1}\n{"b": [1, 2]}\n  {"c": 3,\n "d": x}\n'
+        with pytest.raises(json.JSONDecodeError) as expected:
+            list(ih.yield_objs_from_json(text))
+        for buffer_size in (1, 5, 2 ** 16):
+            for pos in (0, 9):
+                objs = ih.yield_objs_from_json(io.StringIO(text), stream=True, buffer_size=buffer_size, pos=pos)
+                with pytest.raises(json.JSONDecodeError) as e:
+                    list(objs)
+                assert (e.value.pos, e.value.lineno, e.value.colno) == (40, 4, 7)
+                assert str(e.value) == str(expected.value)
+
+
+class Test__yield_objs_from_jsonl_parallel(object):
+    @pytest.fixture
+    def jsonl_path(self, tmpdir, some_dicts):
+        path = tmpdir.join('records.jsonl')
+        path.write('\n'.join([json.dumps(d) for d in some_dicts]) + '\n\n')
+        return str(path)
+
+    def test_ordered(self, jsonl_path, some_dicts):
+        for chunk_size in (1, 10, 2 ** 20):
+            assert list(ih.yield_objs_from_jsonl_parallel(
+                jsonl_path, chunk_size=chunk_size, workers=2, use_threads=True
+            )) == some_dicts
+
+    def test_terms_and_keys_in_processes(self, jsonl_path, some_dicts):
+        expected = [ih.filter_keys(d, 'a, b') for d in ih.find_items(some_dicts, 'a:1')]
+        result = ih.yield_objs_from_jsonl_parallel(
+            jsonl_path, 'a:1', 'a, b', chunk_size=20, workers=2, ordered=False
+        )
+        assert sorted(result, key=repr) == sorted(expected, key=repr)
+
+    def test_invalid_line(self, tmpdir):
+        path = tmpdir.join('bad.jsonl')
+        path.write('{"a": 1}\n{bad\n')
+        with pytest.raises(ValueError) as e:
+            list(ih.yield_objs_from_jsonl_parallel(str(path), workers=1, use_threads=True))
+        assert 'byte 9' in str(e.value)
+
+
+class Test__json_backends(object):
+    texts = [
+        '{"a": 1, "b": [1.5, "c"]}',
+        '{"a": 1}\n\n[2]\n"three" 4\n',
+        '{\n  "a": {\n    "b": 1\n  }\n}\n{"c": NaN}',
+        '[18446744073709551616, -9223372036854775809]',
+        "{'a': 1}",
+    ]
+
+    def test_same_as_json_module(self):
+        for backend in ih.JSON_BACKENDS:
+            for text in self.texts:
+                assert list(ih.yield_objs_from_json(text, backend=backend)) == list(
+                    ih.yield_objs_from_json(text, backend='json')
+                )
+            for text in self.texts[:-1]:
+                assert list(ih.yield_objs_from_json(
+                    io.StringIO(text), stream=True, buffer_size=4, backend=backend
+                )) == list(ih.yield_objs_from_json(io.StringIO(text), stream=True, backend='json'))
+
+    def test_big_ints_stay_ints(self):
+        for backend in ih.JSON_BACKENDS:
+            assert ih.get_obj_from_json(self.texts[3], backend=backend) == [2 ** 64, -2 ** 63 - 1]
+
+    def test_custom_decoder_not_replaced(self):
+        decoder = ih.JSONDecoder(object_hook=lambda d: sorted(d))
+        assert list(ih.yield_objs_from_json('{"b": 1, "a": 2}', decoder=decoder)) == [['a', 'b']]
+
+    def test_bad_backend(self):
+        with pytest.raises(ValueError):
+            ih.get_obj_from_json('{}', backend='nope')
+
+
+class Test__json_and_xml_sources(object):
+    objs = [{'a': 'caf\u00e9 \u2603', 'b': i} for i in range(20)]
+
+    @pytest.fixture
+    def payload(self):
+        return '\n'.join([json.dumps(d, ensure_ascii=False) for d in self.objs]).encode('utf-8')
+
+    def test_buffers(self, payload):
+        for source in (payload, bytearray(payload), memoryview(payload)):
+            for buffer_size in (1, 3, 2 ** 16):
+                assert list(ih.yield_objs_from_json(source=source, buffer_size=buffer_size)) == self.objs
+        assert list(ih.yield_objs_from_json(source=io.BytesIO(payload), buffer_size=3)) == self.objs
+
+    def test_path_and_mmap(self, tmpdir, payload):
+        path = tmpdir.join('records.jsonl')
+        path.write_binary(payload)
+        assert list(ih.yield_objs_from_json(source=str(path))) == self.objs
+        with open(str(path), 'rb') as fp:
+            mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            objs = ih.yield_objs_from_json(source=mm)
+            assert next(objs) == self.objs[0]
+            objs.close()
+            mm.close()
+
+    def test_get_obj_from_json(self):
+        assert ih.get_obj_from_json(source=b'{"x": [1, 2]} {"y": 1}') == {'x': [1, 2]}
+        assert ih.get_obj_from_json(source=io.StringIO('[1]')) == [1]
+
+    def test_xml_source(self, tmpdir):
+        path = tmpdir.join('doc.xml')
+        path.write_binary('<a><b>caf\u00e9</b></a>'.encode('utf-8'))
+        for source in (str(path), memoryview(path.read_binary()), io.StringIO('<a><b>caf\u00e9</b></a>')):
+            root = ih._parse_xml_source(source, buffer_size=3)
+            assert root[0].text == 'caf\u00e9'
+
+    def test_looks_like_path(self):
+        assert ih._looks_like_path('/tmp/some-file.json')
+        assert not ih._looks_like_path('{"a": 1,\n"b": 2}')
+        assert not ih._looks_like_path('x' * 10000)
+
+    def test_path_starting_with_bracket(self, tmpdir):
+        path = tmpdir.join('[2020] export.json')
+        path.write('{"a": 1}')
+        with tmpdir.as_cwd():
+            assert ih.get_obj_from_json('[2020] export.json') == {'a': 1}
+            assert ih.get_obj_from_json('[2020]') == [2020]
+
+
+class Test__iter_objs_from_xml(object):
+    xml = (
+        b'<records><meta><record>no</record></meta>'
+        b'<record id="1"><a>x</a><record>inner</record></record>'
+        b'<record id="2"><a>y</a></record></records>'
+    )
+
+    def test_path_matching(self):
+        for buffer_size in (1, 7, 2 ** 16):
+            elems = ih._iter_xml_elements(self.xml, 'records/record', buffer_size)
+            assert [(e.get('id'), e.find('a').text) for e in elems] == [('1', 'x'), ('2', 'y')]
+        assert [e.text for e in ih._iter_xml_elements(io.StringIO(self.xml.decode()), 'meta/record')] == ['no']
+        assert [e.get('id') or e.text for e in ih._iter_xml_elements(self.xml, 'record')] == ['no', '1', '2']
+
+    def test_nested_kept_until_match_done(self):
+        first = next(ih._iter_xml_elements(self.xml, 'records/record'))
+        assert [c.tag for c in first] == ['a', 'record']
+        assert first.find('record').text == 'inner'
+
+    def test_namespaces(self):
+        xml = (
+            b'<records xmlns="urn:a" xmlns:b="urn:b"><record id="1"/>'
+            b'<b:record id="2"/><record xmlns="" id="3"/></records>'
+        )
+
+        def ids(path):
+            return [e.get('id') for e in ih._iter_xml_elements(xml, path, buffer_size=5)]
+        assert ids('records/record') == ['1', '2', '3']
+        assert ids('{urn:a}records/{urn:a}record') == ['1']
+        assert ids('records/{urn:b}record') == ['2']
+        assert ids('{}record') == ['3']
+        assert ids('{urn:b}records/record') == []
+
+    def test_bad_path(self):
+        with pytest.raises(ValueError):
+            list(ih._iter_xml_elements(self.xml, '/'))
+
+    def test_convention(self):
+        objs = list(ih.iter_objs_from_xml(self.xml, convention='Parker', dict_type=dict))
+        assert objs == [{'a': 'x', 'record': 'inner'}, {'a': 'y'}]
+
+
+class Test__xml_conventions(object):
+    xml = (
+        '<root a="1" b="true"><x>007</x><y>1.5</y><y>text</y>'
+        '<z c="nan"> </z><z>inf</z><w/></root>'
+    )
+
+    def test_badgerfish(self):
+        obj = ih.get_obj_from_xml(self.xml)
+        assert type(obj) == OrderedDict
+        assert obj == {'root': {
+            '@a': 1, '@b': True, 'x': {'$': 7}, 'y': [{'$': 1.5}, {'$': 'text'}],
+            'z': [{'@c': 'nan'}, {'$': 'inf'}], 'w': {},
+        }}
+        assert list(obj['root']) == ['@a', '@b', 'x', 'y', 'z', 'w']
+
+    def test_badgerfish_kwargs(self):
+        obj = ih.get_obj_from_xml(self.xml, dict_type=dict, xml_fromstring=False, simple_text=True)
+        assert type(obj) == dict
+        assert obj == {'root': {
+            '@a': '1', '@b': 'true', 'x': '007', 'y': ['1.5', 'text'],
+            'z': [{'@c': 'nan'}, 'inf'], 'w': '',
+        }}
+
+    def test_parker(self):
+        assert ih.get_obj_from_xml(self.xml, convention='Parker') == {
+            'x': 7, 'y': [1.5, 'text'], 'z': [' ', 'inf'], 'w': None,
+        }
+        data_func = ih._get_xml_data_func('Parker')
+        assert data_func(ih.xml_fromstring('<a><b>1</b></a>'), preserve_root=True) == {'a': {'b': 1}}
+
+    def test_converters_cached(self):
+        assert ih._get_xml_data_func('BadgerFish', dict_type=dict) is ih._get_xml_data_func('BadgerFish', dict_type=dict)
+        with pytest.raises(TypeError):
+            ih._get_xml_data_func('Parker', invalid_tags='keep')
+
+    @pytest.mark.skipif(ih.xmljson is None, reason='xmljson not installed')
+    def test_same_as_xmljson(self):
+        root = ih.xml_fromstring(self.xml)
+        for convention in ('BadgerFish', 'Parker'):
+            for kwargs in ({}, {'xml_fromstring': False}, {'simple_text': True}):
+                expected = getattr(ih.xmljson, convention)(**kwargs).data(root)
+                assert ih._get_xml_data_func(convention, **kwargs)(root) == expected
+
+
+class Test__json_projection(object):
+    records = [
+        {
+            'id': i, 'thing': {'a': i, 'b': {'x': 1, 'y': [{'z': 2, 'q': 3}]}},
+            'l': [{'a': 1, 'junk': 2}, {'a': 3}], 'other': {'deep': {'id': 5}},
+        }
+        for i in range(3)
+    ]
+    key_names = [
+        'id', 'thing.a', 'thing.b', 'thing.b.y.z', 'l.a', 'l', 'other.deep.id, id',
+        'thing.b.x, thing.b', 'missing.x',
+    ]
+
+    def test_keys_same_as_filter_keys(self, monkeypatch):
+        jsonl = '\n'.join([json.dumps(d) for d in self.records])
+        for prune_size in (ih.JSON_PRUNE_MIN_SIZE, 0):
+            monkeypatch.setattr(ih, 'JSON_PRUNE_MIN_SIZE', prune_size)
+            for keys in self.key_names:
+                expected = [ih.filter_keys(d, keys) for d in self.records]
+                assert list(ih.yield_objs_from_json(jsonl, keys=keys)) == expected
+                assert list(ih.yield_objs_from_json(jsonl, keys=keys, backend='json')) == expected
+                assert list(ih.yield_objs_from_json(io.StringIO(jsonl), keys=keys, stream=True, buffer_size=7)) == expected
+                assert ih.get_obj_from_json(json.dumps(self.records + [5]), keys=keys) == expected + [5]
+
+    def test_pruning_decoder(self):
+        decoder = ih._ProjectingDecoder('thing.a, l.a')
+        obj = decoder.decode(json.dumps(self.records[0]))
+        assert obj == {'thing__a': 0, 'l__a': [1, 3]}
+        decoder = ih._ProjectingDecoder('thing.b.x, thing.b')
+        obj = decoder.decode(json.dumps(self.records[0]))
+        assert obj == {'thing__b__x': 1, 'thing__b': self.records[0]['thing']['b']}
+
+    def test_key_ending_at_object(self, monkeypatch):
+        calls = []
+
+        class Decoder(json.JSONDecoder):
+            def raw_decode(self, s, idx=0):
+                calls.append(idx)
+                return super(Decoder, self).raw_decode(s, idx)
+
+        expected = [ih.filter_keys(d, 'id, thing.b') for d in self.records]
+        monkeypatch.setattr(ih, 'JSON_PRUNE_MIN_SIZE', 0)
+        jsonl = '\n'.join([json.dumps(d) for d in self.records])
+        assert list(ih.yield_objs_from_json(jsonl, keys='id, thing.b')) == expected
+        monkeypatch.setattr(ih, 'JSON_DECODER', Decoder())
+        decoder = ih._ProjectingDecoder('id, thing.b')
+        assert decoder.decode(json.dumps(self.records)) == expected
+        assert not decoder.pruning
+        assert calls == [0]
+
+    def test_ignore(self):
+        jsonl = '\n'.join([json.dumps(d) for d in self.records])
+        assert list(ih.yield_objs_from_json(jsonl, ignore='thing, l, other')) == [{'id': 0}, {'id': 1}, {'id': 2}]
+        assert ih.get_obj_from_json(source=jsonl.encode(), ignore=['thing', 'l']) == {'id': 0, 'other': {'deep': {'id': 5}}}
+
+    def test_errors(self):
+        with pytest.raises(ValueError):
+            list(ih.yield_objs_from_json('{}', keys='a', ignore='b'))
+        with pytest.raises(ValueError):
+            list(ih.yield_objs_from_json('{}', keys='a', decoder=json.JSONDecoder()))
+
+
+class Test__json_skip_errors(object):
+    records = [{'a': i, 's': 'x' * (i % 7)} for i in range(30)]
+
+    @pytest.fixture
+    def lines(self):
+        lines = [json.dumps(d) for d in self.records]
+        lines[3] = '{"a": 3, bad}'
+        lines[10] = '{"a": 10,'
+        lines[11] = 'garbage'
+        lines[20] = '{"a": 20, "s": "unterminated'
+        return lines
+
+    def test_skip_and_report(self, lines):
+        text = '\n'.join(lines) + '\n{"last": '
+        expected = [d for i, d in enumerate(self.records) if i not in (3, 10, 11, 20)]
+        expected_skipped = [lines[3], lines[10] + '\n' + lines[11], lines[20], '{"last":']
+        for kwargs in ({}, {'backend': 'json'}, {'stream': True, 'buffer_size': 5}, {'stream': True}):
+            skipped = []
+            json_text = io.StringIO(text) if kwargs.get('stream') else text
+            objs = list(ih.yield_objs_from_json(json_text, skip_errors=True, skipped=skipped, **kwargs))
+            assert objs == expected
+            assert [text[offset:offset + length].strip() for offset, length in skipped] == expected_skipped
+        objs = list(ih.yield_objs_from_json(source=text.encode(), skip_errors=True, buffer_size=3))
+        assert objs == expected
+
+    def test_raises_without_skip(self, lines):
+        with pytest.raises(ValueError):
+            list(ih.yield_objs_from_json('\n'.join(lines)))
+
+    def test_multiline_objects(self):
+        pretty = '\n'.join([json.dumps(d, indent=2) for d in self.records[:5]])
+        pretty = pretty.replace('"a": 2', '"a": 2 x')
+        objs = ih.yield_objs_from_json(io.StringIO(pretty), stream=True, buffer_size=4, skip_errors=True)
+        assert list(objs) == [self.records[i] for i in (0, 1, 3, 4)]
+        array = '[\n{"a": 1},\n{"a": 2}\n]'
+        objs = ih.yield_objs_from_json(io.StringIO(array), stream=True, buffer_size=3, skip_errors=True)
+        assert list(objs) == [[{'a': 1}, {'a': 2}]]
+
+
+class Test__JsonOffsetIndex(object):
+    records = [{'id': i, 's': 'café ☃' * (i % 3), 'n': [i] * (i % 4)} for i in range(50)]
+
+    def _write(self, path, records, mode='w', indent=None):
+        with open(str(path), mode, encoding='utf-8') as fp:
+            for record in records:
+                fp.write(json.dumps(record, indent=indent, ensure_ascii=False) + '\n')
+
+    def test_access(self, tmpdir):
+        for indent in (None, 2):
+            path = tmpdir.join('records{}.json'.format(indent))
+            self._write(path, self.records, indent=indent)
+            index = ih.JsonOffsetIndex(str(path))
+            assert len(index) == 50
+            assert index[0] == self.records[0]
+            assert index[-1] == self.records[-1]
+            assert index[10:20] == self.records[10:20]
+            assert index[::7] == self.records[::7]
+            assert index[48:100] == self.records[48:]
+            with pytest.raises(IndexError):
+                index[50]
+
+    def test_sidecar_and_update(self, tmpdir):
+        path = tmpdir.join('records.jsonl')
+        self._write(path, self.records[:30])
+        index = ih.JsonOffsetIndex(str(path))
+        assert tmpdir.join('records.jsonl.idx').size() == 8 * (5 + 30)
+        text = ''.join([json.dumps(d) + '\n' for d in self.records[30:]])
+        with open(str(path), 'a') as fp:
+            fp.write(text[:len(text) // 2 + 3])
+        new_count = index.update()
+        assert 0 < new_count < 20
+        assert index[:] == self.records[:len(index)]
+        with open(str(path), 'a') as fp:
+            fp.write(text[len(text) // 2 + 3:])
+        index.update()
+        assert index[:] == self.records
+        loaded = ih.JsonOffsetIndex(str(path), backend='json')
+        assert loaded.offsets == index.offsets
+        assert loaded.update() == 0
+        self._write(path, self.records[:3])
+        assert index.update() == 3
+        assert index[:] == self.records[:3]
+
+    def test_rewritten_file(self, tmpdir):
+        path = tmpdir.join('records.jsonl')
+        self._write(path, self.records[:10])
+        index = ih.JsonOffsetIndex(str(path))
+        self._write(path, self.records[10:21])
+        mtime = os.stat(str(path)).st_mtime_ns
+        os.utime(str(path), ns=(mtime, mtime + 10 ** 9))
+        loaded = ih.JsonOffsetIndex(str(path))
+        assert loaded[:] == self.records[10:21]
+        assert index.update() == 11
+        assert index[:] == self.records[10:21]
+
+    def test_in_memory(self, tmpdir):
+        path = tmpdir.join('records.jsonl')
+        self._write(path, self.records)
+        index = ih.JsonOffsetIndex(str(path), index_path=False)
+        assert index[5] == self.records[5]
+        assert tmpdir.listdir() == [path]
+        self._write(path, self.records[:5], mode='a')
+        assert index.update() == 5
+        assert index[-5:] == self.records[:5]
+
+    def test_invalid(self, tmpdir):
+        path = tmpdir.join('bad.jsonl')
+        path.write('{"a": 1}\n{"a": 2,\n{"a": 3}\n')
+        with pytest.raises(ValueError):
+            ih.JsonOffsetIndex(str(path))
+
+
+class Test__compressed_inputs(object):
+    records = [{'id': i, 'url': 'https://example.com/{}'.format(i), 's': 'café'} for i in range(20)]
+
+    @pytest.fixture(params=sorted(ih.COMPRESSED_OPENERS) + ['.data'])
+    def write(self, request, tmpdir):
+        ext = request.param
+        opener = ih.COMPRESSED_OPENERS.get(ext, ih.gzip.open)
+
+        def write(name, text):
+            path = str(tmpdir.join(name + ext))
+            with opener(path, 'wb') as fp:
+                fp.write(text.encode('utf-8'))
+            return path
+
+        return write
+
+    def test_json(self, write):
+        path = write('records.jsonl', ''.join([json.dumps(d) + '\n' for d in self.records]))
+        assert list(ih.yield_objs_from_json(path)) == self.records
+        assert list(ih.yield_objs_from_json(path, stream=True, buffer_size=7)) == self.records
+        assert list(ih.yield_objs_from_json(source=path, buffer_size=7)) == self.records
+
+    def test_xml(self, write):
+        path = write('records.xml', '<records><record><id>1</id></record><record><id>2</id></record></records>')
+        assert ih.get_obj_from_xml(path, convention='Parker') == {'record': [{'id': 1}, {'id': 2}]}
+        assert list(ih.iter_objs_from_xml(path, convention='Parker')) == [{'id': 1}, {'id': 2}]
+
+    def test_urls(self, write):
+        path = write('urls.txt', ''.join(['see {} now\n'.format(d['url']) for d in self.records]))
+        assert ih.get_all_urls(path) == [d['url'] for d in self.records]
+
+    def test_plain_file_with_compressed_extension(self, tmpdir):
+        for ext in ih.COMPRESSED_OPENERS:
+            path = tmpdir.join('plain' + ext)
+            path.write('{"a": 1}')
+            assert list(ih.yield_objs_from_json(str(path))) == [{'a': 1}]
+            with ih.open_path(str(path), 'rt') as fp:
+                assert fp.read() == '{"a": 1}'
+
+    def test_empty_file(self, tmpdir):
+        path = tmpdir.join('empty.gz')
+        path.write('')
+        assert list(ih.yield_objs_from_json(str(path))) == []